@@ -0,0 +1,70 @@
+# 벤치마크용 가짜 facefusion.py
+# job-submit / job-run 과 .jobs 폴더 이동, tqdm 형식 진행률 출력만 흉내 낸다
+import json
+import os
+import sys
+import time
+
+RENDER_SECONDS = float(os.getenv("FAKE_RENDER_SECONDS", "1.0"))
+OUTPUT_BYTES = int(float(os.getenv("FAKE_OUTPUT_MB", "2")) * 1024 * 1024)
+TOTAL_FRAMES = int(os.getenv("FAKE_FRAMES", "48"))
+CHUNK = b"\0" * (1024 * 1024)
+
+
+def job_path(status, job_id):
+    return os.path.join(".jobs", status, f"{job_id}.json")
+
+
+def render_step(args):
+    start = args.get("trim_frame_start") or 0
+    end = args.get("trim_frame_end") or TOTAL_FRAMES
+    frames = max(1, min(end, TOTAL_FRAMES) - start)
+    seconds = RENDER_SECONDS * frames / TOTAL_FRAMES
+    started = time.time()
+    for frame in range(1, frames + 1):
+        time.sleep(seconds / frames)
+        elapsed = time.time() - started
+        fps = frame / elapsed if elapsed else 0
+        eta = int((frames - frame) / fps) if fps else 0
+        sys.stderr.write(
+            f"\rProcessing: {frame * 100 // frames:3d}%|#| {frame}/{frames} "
+            f"[00:{int(elapsed):02d}<00:{eta:02d}, {fps:.2f}frame/s]"
+        )
+        sys.stderr.flush()
+    sys.stderr.write("\n")
+
+    size = OUTPUT_BYTES * frames // TOTAL_FRAMES
+    temp_path = f"{args['output_path']}.tmp"
+    with open(temp_path, "wb") as f:
+        while size > 0:
+            f.write(CHUNK[:size])
+            size -= len(CHUNK)
+    os.replace(temp_path, args["output_path"])
+
+
+def main():
+    command, job_id = sys.argv[1], sys.argv[2]
+    for status in ("drafted", "queued", "completed", "failed"):
+        os.makedirs(os.path.join(".jobs", status), exist_ok=True)
+
+    if command == "job-submit":
+        os.replace(job_path("drafted", job_id), job_path("queued", job_id))
+        return 0
+    if command == "job-run":
+        with open(job_path("queued", job_id), "r") as f:
+            steps = json.load(f)["steps"]
+        try:
+            for step in steps:
+                render_step(step["args"])
+        except OSError as e:
+            print(f"[FACEFUSION.CORE] job {job_id} failed: {e}")
+            os.replace(job_path("queued", job_id), job_path("failed", job_id))
+            return 1
+        os.replace(job_path("queued", job_id), job_path("completed", job_id))
+        return 0
+    print(f"unsupported command: {command}")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+# 엔드투엔드 벤치마크: 가짜 facefusion.py 와 메인 서버 대역으로 서버를 띄우고 /run_ai/ 부하를 건다
+# 예: python benchmark/run.py --requests 40 --concurrency 8 --render-seconds 1 --workers 2
+import argparse
+import asyncio
+import io
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from PIL import Image
+
+from stub_main_server import StubMainServer
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARK_DIR)
+API_KEY = "benchmark"
+STAGE_PATTERN = re.compile(r'ai_stage_seconds_(sum|count)\{stage="([^"]+)"\} ([\d.e+-]+)')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def prepare_workdir(workdir, targets, target_mb):
+    facefusion_dir = os.path.join(workdir, "facefusion")
+    for status in ("drafted", "queued", "completed", "failed"):
+        os.makedirs(os.path.join(facefusion_dir, ".jobs", status), exist_ok=True)
+    shutil.copyfile(os.path.join(BENCHMARK_DIR, "fake_facefusion.py"), os.path.join(facefusion_dir, "facefusion.py"))
+
+    target_paths = []
+    os.makedirs(os.path.join(workdir, "targets"), exist_ok=True)
+    for number in range(targets):
+        path = os.path.join(workdir, "targets", f"target{number + 1}.mp4")
+        with open(path, "wb") as f:
+            f.write(os.urandom(1024) + b"\0" * int(target_mb * 1024 * 1024))
+        target_paths.append(path)
+    return target_paths
+
+
+def server_env(args, workdir, target_paths, stub):
+    env = os.environ.copy()
+    env.update({
+        "PYTHONPATH": PROJECT_ROOT,
+        "API_KEY": API_KEY,
+        "AI_PROFILE": args.profile,
+        "MAIN_SERVER_IP_URL": "127.0.0.1",
+        "MAIN_SERVER_UPLOAD_URL": stub.url,
+        "AI_RUNNER_MODE": args.runner,
+        "AI_FACEFUSION_PYTHON": sys.executable,
+        "AI_FAKE_RENDER_SECONDS": str(args.render_seconds),
+        "FAKE_RENDER_SECONDS": str(args.render_seconds),
+        "FAKE_OUTPUT_MB": str(args.output_mb),
+        "AI_WORKER_COUNT": str(args.workers),
+        "AI_UPLOAD_WORKERS": str(args.upload_workers),
+        "AI_PIPELINED_DELIVERY": "1" if args.pipelined else "0",
+        "AI_SEGMENTS": str(args.segments),
+        "AI_JOB_TEMPLATE": os.path.join(PROJECT_ROOT, "basicTemp.json"),
+        "AI_DRAFTED_FOLDER": os.path.join(workdir, "facefusion", ".jobs", "drafted"),
+        "AI_OUTPUT_FOLDER": os.path.join(workdir, "outputs"),
+        "AI_RESULT_CACHE_FOLDER": os.path.join(workdir, "result_cache"),
+        "AI_FACE_CACHE_FOLDER": os.path.join(workdir, "face_cache"),
+        "AI_TARGET_VIDEOS": ",".join(target_paths)
+    })
+    return env
+
+
+async def wait_ready(client, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            if (await client.get("/metrics")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start in time")
+
+
+def source_image(seed=None):
+    # 서버가 이미지 형식을 검사하므로 작은 PNG 를 만든다 (seed 가 다르면 다른 이미지)
+    pixels = (b"benchmark" * 400)[:32 * 32 * 3] if seed is None else os.urandom(32 * 32 * 3)
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (32, 32), pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def finished(job):
+    if job["status"] in ("failed", "cancelled"):
+        return True
+    if job["status"] != "completed":
+        return False
+    deliveries = job.get("delivery", {}).values()
+    return all(delivery["status"] in ("delivered", "failed") for delivery in deliveries)
+
+
+async def one_request(client, number, args, target_count):
+    headers = {"X-API-KEY": API_KEY}
+    # 요청마다 다른 source 이미지를 보내 결과 캐시를 피한다 (--reuse-source 이면 같은 이미지)
+    source = source_image(None if args.reuse_source else number)
+    data = {"index": str(number % target_count), "gender": "0"}
+    if args.preview:
+        data["preview"] = "true"
+
+    started = time.perf_counter()
+    response = await client.post("/run_ai/", data=data, files={"file": ("source.png", source, "image/png")}, headers=headers)
+    if response.status_code != 200:
+        return {"ok": False, "status_code": response.status_code, "latency": time.perf_counter() - started}
+    job_id = response.json()["job_id"]
+    while True:
+        await asyncio.sleep(args.poll_interval)
+        job = (await client.get(f"/jobs/{job_id}", headers=headers)).json()
+        if finished(job):
+            break
+    return {"ok": job["status"] == "completed", "latency": time.perf_counter() - started, "job": job}
+
+
+async def drive(args, base_url, target_count):
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def limited(number):
+            async with slots:
+                return await one_request(client, number, args, target_count)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(limited(number) for number in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        metrics_text = (await client.get("/metrics")).text
+    return results, elapsed, metrics_text
+
+
+def stage_summary(metrics_text):
+    sums, counts = {}, {}
+    for kind, stage, value in STAGE_PATTERN.findall(metrics_text):
+        (sums if kind == "sum" else counts)[stage] = float(value)
+    return {stage: {"count": int(counts[stage]), "mean": sums[stage] / counts[stage]}
+            for stage in sums if counts.get(stage)}
+
+
+def report(args, results, elapsed, stages, stub):
+    latencies = [result["latency"] for result in results if result["ok"]]
+    summary = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "succeeded": len(latencies),
+        "failed": len(results) - len(latencies),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else None,
+        "latency_seconds": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies, default=None)
+        },
+        "stages": stages,
+        "uploads_received": stub.uploads,
+        "bytes_received": stub.bytes_received
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return summary
+
+    print(f"\n[=] {summary['succeeded']}/{args.requests} succeeded in {elapsed:.2f}s "
+          f"({summary['throughput_rps']} req/s, concurrency {args.concurrency})")
+    print("[=] latency " + "  ".join(
+        f"{name}={value:.3f}s" for name, value in summary["latency_seconds"].items() if value is not None))
+    print(f"[=] main server received {stub.uploads} uploads, {stub.bytes_received / 1024 / 1024:.1f} MB")
+    print(f"\n{'stage':<24}{'count':>8}{'mean (s)':>12}")
+    for stage, values in sorted(stages.items(), key=lambda item: -item[1]["mean"] * item[1]["count"]):
+        print(f"{stage:<24}{values['count']:>8}{values['mean']:>12.4f}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end /run_ai/ benchmark against a fake FaceFusion.")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--runner", choices=("spawn", "fake"), default="spawn",
+                        help="spawn runs benchmark/fake_facefusion.py as a subprocess, fake stays in-process")
+    parser.add_argument("--profile", default="cuda-run")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--upload-workers", type=int, default=2)
+    parser.add_argument("--no-pipelined", dest="pipelined", action="store_false")
+    parser.add_argument("--segments", type=int, default=1)
+    parser.add_argument("--preview", action="store_true")
+    parser.add_argument("--render-seconds", type=float, default=1.0)
+    parser.add_argument("--output-mb", type=float, default=2.0)
+    parser.add_argument("--targets", type=int, default=4)
+    parser.add_argument("--target-mb", type=float, default=1.0)
+    parser.add_argument("--upload-delay", type=float, default=0.0, help="seconds the stub main server holds each upload")
+    parser.add_argument("--reuse-source", action="store_true", help="send the same source image (exercises the result cache)")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--keep", action="store_true", help="keep the work directory")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="aiserver-bench-")
+    stub = StubMainServer(delay=args.upload_delay).start()
+    port = free_port()
+    target_paths = prepare_workdir(workdir, args.targets, args.target_mb)
+    log_path = os.path.join(workdir, "server.log")
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=workdir, env=server_env(args, workdir, target_paths, stub), stdout=log, stderr=subprocess.STDOUT
+        )
+    try:
+        async def run():
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+                await wait_ready(client, process)
+            return await drive(args, f"http://127.0.0.1:{port}", len(target_paths))
+
+        results, elapsed, metrics_text = asyncio.run(run())
+        report(args, results, elapsed, stage_summary(metrics_text), stub)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        stub.stop()
+        if args.keep:
+            print(f"[=] Work directory kept at {workdir} (server log: {log_path})")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
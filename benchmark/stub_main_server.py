@@ -0,0 +1,63 @@
+# 벤치마크용 메인 서버 대역: /upload_result/ 로 오는 결과를 받아 버리고 바이트 수만 센다
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubMainServer:
+    """Local stand-in for the main server's upload receivers."""
+
+    def __init__(self, port=0, delay=0.0):
+        self.delay = delay
+        self.uploads = 0
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.port = self.httpd.server_address[1]
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/upload_result/"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                remaining = int(self.headers.get("Content-Length", "0"))
+                received = 0
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                    remaining -= len(chunk)
+                if stub.delay:
+                    time.sleep(stub.delay)
+                with stub.lock:
+                    stub.uploads += 1
+                    stub.bytes_received += received
+                body = json.dumps({"status": "ok", "bytes": received}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
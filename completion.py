@@ -0,0 +1,105 @@
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import sys
+import time
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+class Inotify:
+    """Minimal inotify binding (Linux only) that wakes an asyncio.Event on changes."""
+
+    def __init__(self, loop, event):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.libc = libc
+        self.loop = loop
+        self.event = event
+        loop.add_reader(self.fd, self._drain)
+
+    def watch(self, folder):
+        if os.path.isdir(folder):
+            self.libc.inotify_add_watch(self.fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+
+    def _drain(self):
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self.event.set()
+
+    def close(self):
+        self.loop.remove_reader(self.fd)
+        os.close(self.fd)
+
+
+def job_status(jobs_path, job_id):
+    for status in ("completed", "failed"):
+        if os.path.exists(os.path.join(jobs_path, status, f"{job_id}.json")):
+            return status
+    return None
+
+
+async def wait_for_output(output_path, job_id=None, jobs_path=None, timeout=300, stable_for=0.5, poll_interval=1.0):
+    """Wait until output_path is complete without blocking the event loop.
+
+    The output counts as finished as soon as FaceFusion has moved the job
+    to ``.jobs/completed``. Without that signal, its size must stay the
+    same for ``stable_for`` seconds. A job in ``.jobs/failed`` raises
+    RuntimeError. On Linux, inotify wakes the watcher on every change;
+    elsewhere it falls back to polling every ``poll_interval`` seconds.
+    """
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    notifier = None
+    if sys.platform.startswith("linux"):
+        try:
+            notifier = Inotify(loop, changed)
+            notifier.watch(os.path.dirname(os.path.abspath(output_path)))
+            if jobs_path is not None:
+                for status in ("completed", "failed"):
+                    notifier.watch(os.path.join(jobs_path, status))
+        except (OSError, AttributeError):
+            notifier = None
+
+    deadline = time.monotonic() + timeout
+    last_size = None
+    stable_since = None
+    try:
+        while True:
+            changed.clear()
+            status = job_status(jobs_path, job_id) if jobs_path and job_id else None
+            if status == "failed":
+                raise RuntimeError(f"job {job_id} failed")
+            size = os.path.getsize(output_path) if os.path.exists(output_path) else None
+            if size is not None and status == "completed":
+                return output_path
+            now = time.monotonic()
+            if size is not None and size > 0 and size == last_size:
+                if now - stable_since >= stable_for:
+                    return output_path
+            else:
+                last_size, stable_since = size, now
+            if now >= deadline:
+                raise TimeoutError(f"{output_path} was not completed within {timeout}s")
+
+            # 크기 확인 중이면 stable_for 뒤에 다시 확인, 그 외에는 변경 알림(또는 polling) 대기
+            wait = poll_interval if notifier is None else timeout
+            if size is not None:
+                wait = min(wait, stable_for)
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=max(0.01, min(wait, deadline - now)))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if notifier is not None:
+            notifier.close()
@@ -0,0 +1,37 @@
+from starlette.responses import FileResponse
+
+
+def etag_for(job_id, stat_result):
+    # 같은 job 의 결과라도 다시 렌더링되면 (크기, 수정 시각) 이 바뀌므로 ETag 도 바뀐다
+    return f'"{job_id}-{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def etag_matches(if_none_match, etag):
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in tags or f"W/{etag}" in tags
+
+
+class ResultFileResponse(FileResponse):
+    """FileResponse that hands whole-file bodies to the server's sendfile.
+
+    When the ASGI server offers the ``http.response.pathsend`` extension
+    (e.g. Granian), a full response is sent by path and the server copies
+    it with sendfile. Range requests and servers without the extension
+    (uvicorn) fall back to Starlette's chunked reads, in larger chunks.
+    """
+
+    chunk_size = 1024 * 1024
+
+    async def __call__(self, scope, receive, send):
+        self.pathsend = "http.response.pathsend" in scope.get("extensions", {})
+        await super().__call__(scope, receive, send)
+
+    async def _handle_simple(self, send, send_header_only):
+        if not self.pathsend or send_header_only:
+            return await super()._handle_simple(send, send_header_only)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.pathsend", "path": str(self.path)})
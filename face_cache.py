@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import uuid
+
+import numpy
+
+FACE_CACHE_FOLDER = os.path.abspath(os.getenv("AI_FACE_CACHE_FOLDER", "face_cache/"))
+
+# 프레임 추출과 얼굴 검출 결과에 영향을 주는 job 인자
+DETECTOR_ARGS = (
+    "face_detector_model",
+    "face_detector_angles",
+    "face_detector_size",
+    "face_detector_score",
+    "face_landmarker_model",
+    "face_landmarker_score",
+    "output_video_resolution",
+    "output_video_fps",
+    "trim_frame_start",
+    "trim_frame_end",
+    "temp_frame_format"
+)
+
+# 파일 이름이 이미 내용의 sha256 인 폴더 (UploadStore 가 등록)
+CONTENT_ADDRESSED_FOLDERS = set()
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    path = os.path.abspath(path)
+    name = os.path.basename(path).split(".", 1)[0]
+    if os.path.dirname(path) in CONTENT_ADDRESSED_FOLDERS and len(name) == 64:
+        return name
+    stat = os.stat(path)
+    return _hash_file(path, stat.st_size, stat.st_mtime_ns, chunk_size)
+
+
+@functools.lru_cache(maxsize=256)
+def _hash_file(path, size, mtime_ns, chunk_size):
+    # size, mtime_ns 는 파일이 바뀌면 다시 계산하도록 memo key 에만 쓰인다
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(target_path, step_args):
+    detector_settings = {key: step_args.get(key) for key in DETECTOR_ARGS}
+    digest = hashlib.sha256(file_hash(target_path).encode())
+    digest.update(json.dumps(detector_settings, sort_keys=True).encode())
+    return digest.hexdigest()[:32]
+
+
+def cache_path(key):
+    return os.path.join(FACE_CACHE_FOLDER, f"{key}.npz")
+
+
+def lookup(target_path, step_args):
+    """Return (cache file, hit) for a target rendered with the given job args."""
+    path = cache_path(cache_key(target_path, step_args))
+    return path, os.path.exists(path)
+
+
+def existing_caches(steps_args):
+    # job 에 실제로 들어간 인자(preview 해상도, segment 구간 등)로 찾는다
+    paths = []
+    for step_args in steps_args:
+        try:
+            path, hit = lookup(step_args["target_path"], step_args)
+        except OSError:
+            continue
+        if hit and path not in paths:
+            paths.append(path)
+    return paths
+
+
+def source_cache_path(image_path):
+    # 업로드 이미지 옆에 source 얼굴 분석(임베딩 포함)을 저장
+    return f"{os.path.splitext(os.path.abspath(image_path))[0]}.faces.npz"
+
+
+def job_options(job_path, source_path=None):
+    """Warm worker options that load cached faces for a drafted job's steps and source."""
+    with open(job_path, "r", encoding="utf-8") as f:
+        steps = json.load(f)["steps"]
+    options = {"face_cache_in": existing_caches(step["args"] for step in steps)}
+    if source_path is not None:
+        source_faces = source_cache_path(source_path)
+        if os.path.exists(source_faces):
+            options["face_cache_in"].append(source_faces)
+        else:
+            options["source_path"] = os.path.abspath(source_path)
+            options["source_faces_out"] = source_faces
+    return options
+
+
+def save_static_faces(path, static_faces):
+    # static_faces: {frame hash: [Face, ...]} (facefusion face_store 형식)
+    frame_hashes = list(static_faces)
+    face_frames = []
+    faces = []
+    for frame_number, frame_hash in enumerate(frame_hashes):
+        for face in static_faces[frame_hash] or []:
+            face_frames.append(frame_number)
+            faces.append(face._asdict())
+
+    columns = {}
+    for field in faces[0] if faces else []:
+        values = [face[field] for face in faces]
+        if isinstance(values[0], dict):
+            for key in values[0]:
+                columns[f"{field}:dict:{key}"] = _pack([value[key] for value in values])
+        elif isinstance(values[0], range):
+            columns[f"{field}:range"] = numpy.array([(value.start, value.stop) for value in values])
+        else:
+            columns[f"{field}:value"] = _pack(values)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp.npz"
+    numpy.savez_compressed(
+        temp_path,
+        frame_hashes=numpy.array(frame_hashes),
+        face_frames=numpy.array(face_frames, dtype=numpy.int32),
+        **columns
+    )
+    os.replace(temp_path, path)
+    print(f"[+] Face cache saved at {path} ({len(frame_hashes)} frames, {len(faces)} faces)")
+
+
+def load_static_faces(path, face_type):
+    with numpy.load(path, allow_pickle=True) as data:
+        frame_hashes = [str(frame_hash) for frame_hash in data["frame_hashes"]]
+        face_frames = data["face_frames"]
+        fields = {}
+        for name in data.files:
+            if ":" not in name:
+                continue
+            field, kind, *key = name.split(":", 2)
+            column = data[name]
+            if kind == "dict":
+                fields.setdefault(field, [{} for _ in face_frames])
+                for face_fields, value in zip(fields[field], column):
+                    face_fields[key[0]] = value
+            elif kind == "range":
+                fields[field] = [range(int(start), int(stop)) for start, stop in column]
+            else:
+                fields[field] = list(column)
+
+    static_faces = {frame_hash: [] for frame_hash in frame_hashes}
+    for number, frame_number in enumerate(face_frames):
+        face = face_type(**{field: values[number] for field, values in fields.items()})
+        static_faces[frame_hashes[frame_number]].append(face)
+    return static_faces
+
+
+def _pack(values):
+    if all(isinstance(value, numpy.ndarray) for value in values) and len({value.shape for value in values}) == 1:
+        return numpy.stack(values)
+    if all(isinstance(value, (int, float, numpy.number)) for value in values):
+        return numpy.array(values)
+    packed = numpy.empty(len(values), dtype=object)
+    packed[:] = values
+    return packed
+
+
+def create_prime_job(template, target_path, drafted_folder, settings=None):
+    # face_debugger 만 실행해 target 의 모든 프레임을 한 번 분석
+    output_path = os.path.join(FACE_CACHE_FOLDER, f"prime_{uuid.uuid4().hex[:8]}.mp4")
+    os.makedirs(FACE_CACHE_FOLDER, exist_ok=True)
+    job_id, _ = template.write(drafted_folder, [{
+        **(settings or {}),
+        "source_paths": [],
+        "target_path": os.path.abspath(target_path),
+        "output_path": output_path,
+        "processors": ["face_debugger"]
+    }], job_id=f"prime_{uuid.uuid4().hex[:8]}")
+    return job_id, output_path
+
+
+async def precompute(pool, template, drafted_folder, target_paths, execution_settings=None, settings=None):
+    """Analyse every target once on the warm worker pool and store its face cache.
+
+    Prime jobs are written to ``drafted_folder``, which must be the one the
+    pool's FaceFusion reads (``.jobs/drafted`` under its working folder).
+    ``settings`` are the job arg overrides of the renders that should find
+    the cache, so both analyse the same frames.
+    """
+    step_args = {**template.args, **(settings or {})}
+
+    async def prime(target_path):
+        try:
+            path, hit = await asyncio.to_thread(lookup, target_path, step_args)
+        except OSError as e:
+            print(f"❌ Face cache precompute skipped for {target_path}: {e}")
+            return
+        if hit:
+            print(f"[=] Face cache hit for {target_path}")
+            return
+        job_id, output_path = create_prime_job(template, target_path, drafted_folder, settings)
+        try:
+            await pool.run(job_id, execution_settings, face_cache_out=path)
+        except RuntimeError as e:
+            print(f"❌ Face cache precompute failed for {target_path}: {e}")
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+    await asyncio.gather(*(prime(target_path) for target_path in dict.fromkeys(target_paths)))
+
+
+def main():
+    from facefusion_worker import WarmWorkerPool
+    from job_template import JobTemplate
+
+    parser = argparse.ArgumentParser(description="Precompute face analysis caches for target videos.")
+    parser.add_argument("targets", nargs="+")
+    parser.add_argument("--template", required=True)
+    parser.add_argument("--drafted-folder", default=os.path.join("facefusion", ".jobs", "drafted"),
+                        help="FaceFusion's .jobs/drafted folder (default: facefusion/.jobs/drafted)")
+    parser.add_argument("--execution-providers", default=None)
+    parser.add_argument("--python", default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    execution_settings = {}
+    if args.execution_providers:
+        execution_settings["execution-providers"] = args.execution_providers
+
+    async def run():
+        pool = WarmWorkerPool(size=args.workers, python_path=args.python)
+        pool.start()
+        try:
+            await precompute(pool, JobTemplate(args.template), args.drafted_folder, args.targets, execution_settings)
+        finally:
+            pool.stop()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+
+import metrics
+
+WORKER_SCRIPT = os.path.abspath(__file__)
+
+# 상주 프로세스에서 모델 세션을 유지하기 위한 기본 인자
+WARM_RUN_ARGS = ["--video-memory-strategy", "tolerant"]
+# 워커가 메모리에 들고 있는 face cache 파일 수 (오래 안 쓴 것부터 내린다)
+LOADED_CACHE_LIMIT = int(os.getenv("AI_WORKER_FACE_CACHES", "8"))
+
+
+def execution_args(execution_settings):
+    args = []
+    for key, value in (execution_settings or {}).items():
+        args += [f"--{key}"] + (value if isinstance(value, list) else [str(value)])
+    return args
+
+
+def temp_env(env, temp_path):
+    # facefusion 은 시스템 temp 폴더 아래에 frame 을 추출하므로 프로세스마다 temp 폴더를 따로 준다
+    os.makedirs(temp_path, exist_ok=True)
+    env = dict(os.environ if env is None else env)
+    for name in ("TMPDIR", "TEMP", "TMP"):
+        env[name] = temp_path
+    return env
+
+
+def kill_process_tree(process):
+    # ffmpeg 등 facefusion 이 띄운 자식 프로세스까지 함께 종료
+    # (POSIX 에서는 start_new_session=True 로 띄운 프로세스 그룹 단위로 종료)
+    if process.poll() is not None:
+        return
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/T", "/F", "/PID", str(process.pid)], capture_output=True)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    process.wait()
+
+
+class WarmWorker:
+    """One resident ``facefusion_worker.py`` process.
+
+    Job specs go to the child as JSON lines on stdin and the child answers
+    with one JSON line per job on stdout. FaceFusion's own output is sent to
+    the child's stderr so it never mixes with the protocol.
+    """
+
+    def __init__(self, number, python_path, cwd, env=None, temp_path=None):
+        self.number = number
+        self.python_path = python_path
+        self.cwd = cwd
+        self.env = env
+        self.temp_path = temp_path
+        self.process = None
+        self.on_output = None
+        self.job_id = None
+        self.lock = threading.Lock()
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [self.python_path, WORKER_SCRIPT],
+            cwd=self.cwd,
+            env=self.env if self.temp_path is None else temp_env(self.env, self.temp_path),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            start_new_session=True
+        )
+        threading.Thread(target=self._pump_output, args=(self.process,), daemon=True).start()
+        print(f"[+] Warm worker {self.number} started (pid {self.process.pid})")
+
+    def _pump_output(self, process):
+        # facefusion 출력(stderr)을 읽어 현재 job 의 on_output 으로 전달
+        for line in process.stderr:
+            on_output = self.on_output
+            if on_output is not None and on_output(line):
+                continue
+            sys.stderr.write(line)
+
+    def stop(self):
+        if not self.alive():
+            return
+        self.process.stdin.close()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def kill(self):
+        # 실행 중인 job 을 중단: 프로세스를 종료하고 temp frame 을 지운다 (다음 요청 때 다시 시작)
+        if self.process is not None:
+            kill_process_tree(self.process)
+        if self.temp_path is not None:
+            shutil.rmtree(self.temp_path, ignore_errors=True)
+        print(f"[-] Warm worker {self.number} killed")
+
+    def request(self, spec, on_output=None):
+        with self.lock:
+            if not self.alive():
+                self.start()
+            self.on_output = on_output
+            self.job_id = spec["job_id"]
+            try:
+                self.process.stdin.write(json.dumps(spec) + "\n")
+                self.process.stdin.flush()
+                line = self.process.stdout.readline()
+                if not line:
+                    code = self.process.wait()
+                    raise RuntimeError(f"warm worker {self.number} exited with code {code}")
+                return json.loads(line)
+            finally:
+                self.on_output = None
+                self.job_id = None
+
+
+class WarmWorkerPool:
+    def __init__(self, size=1, python_path=None, cwd="facefusion", env=None, temp_folder=None):
+        self.workers = [
+            WarmWorker(n, python_path or sys.executable, cwd, env,
+                       None if temp_folder is None else os.path.join(temp_folder, f"worker-{n}"))
+            for n in range(max(1, size))
+        ]
+        self._idle = None
+
+    def start(self):
+        self._idle = asyncio.Queue()
+        for worker in self.workers:
+            worker.start()
+            self._idle.put_nowait(worker)
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def cancel(self, job_id):
+        for worker in self.workers:
+            if worker.job_id == job_id:
+                worker.kill()
+
+    async def run(self, job_id, execution_settings=None, on_output=None, **options):
+        worker = await self._idle.get()
+        try:
+            spec = {"job_id": job_id, "run_args": execution_args(execution_settings) + WARM_RUN_ARGS, **options}
+            reply = await asyncio.to_thread(worker.request, spec, on_output)
+        finally:
+            self._idle.put_nowait(worker)
+        for step, code in reply["returncodes"].items():
+            metrics.SUBPROCESS_EXITS.inc(command=step, code=code)
+            if code != 0:
+                raise RuntimeError(f"{step} failed for {job_id} (exit {code})")
+        print(f"[+] Job {job_id} executed on warm worker {worker.number}")
+
+
+def run_command(core, argv):
+    sys.argv = ["facefusion.py"] + argv
+    try:
+        core.cli()
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    return 0
+
+
+def static_faces():
+    from facefusion import face_store
+    return face_store.FACE_STORE["static_faces"]
+
+
+def clear_faces():
+    from facefusion import face_store
+    face_store.clear_static_faces()
+
+
+def face_type():
+    try:
+        from facefusion.types import Face
+    except ImportError:
+        from facefusion.typing import Face
+    return Face
+
+
+def save_source_faces(face_cache, source_path, path):
+    from facefusion import face_store
+    from facefusion.vision import read_static_image
+    frame_hash = face_store.create_frame_hash(read_static_image(source_path))
+    faces = static_faces().get(frame_hash)
+    if faces:
+        face_cache.save_static_faces(path, {frame_hash: faces})
+
+
+def main():
+    # stdout 은 서버와의 통신 전용, FaceFusion 출력은 stderr 로 보낸다
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    sys.path.insert(0, os.getcwd())
+    from facefusion import core
+    import face_cache
+
+    loaded_caches = OrderedDict()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        spec = json.loads(line)
+        job_id = spec["job_id"]
+        returncodes = {"job-submit": run_command(core, ["job-submit", job_id])}
+        if returncodes["job-submit"] == 0:
+            # face_store 는 프로세스가 살아 있는 동안 계속 쌓이므로 job 마다 비우고
+            # 이 job 에 필요한 (미리 계산한) 얼굴 분석만 올려 검출을 건너뛴다
+            clear_faces()
+            for path in spec.get("face_cache_in", []):
+                if path not in loaded_caches:
+                    try:
+                        loaded_caches[path] = face_cache.load_static_faces(path, face_type())
+                    except (OSError, ValueError, KeyError, TypeError) as e:
+                        print(f"❌ Face cache {path} could not be loaded: {e}", file=sys.stderr)
+                        loaded_caches[path] = {}
+                loaded_caches.move_to_end(path)
+                static_faces().update(loaded_caches[path])
+            while len(loaded_caches) > LOADED_CACHE_LIMIT:
+                loaded_caches.popitem(last=False)
+            known_frames = set(static_faces())
+            returncodes["job-run"] = run_command(core, ["job-run", job_id] + spec.get("run_args", []))
+            if returncodes["job-run"] == 0 and spec.get("face_cache_out"):
+                new_faces = {key: value for key, value in static_faces().items() if key not in known_frames}
+                # 빈 cache 파일은 영구적인 hit 으로 취급되므로 얼굴이 없으면 쓰지 않는다
+                if any(new_faces.values()):
+                    face_cache.save_static_faces(spec["face_cache_out"], new_faces)
+                else:
+                    print(f"[!] No faces found by {job_id}; face cache not written", file=sys.stderr)
+            if returncodes["job-run"] == 0 and spec.get("source_faces_out"):
+                try:
+                    save_source_faces(face_cache, spec["source_path"], spec["source_faces_out"])
+                except (ImportError, AttributeError, OSError) as e:
+                    print(f"❌ Source face cache not saved: {e}", file=sys.stderr)
+            clear_faces()
+        channel.write(json.dumps({"job_id": job_id, "returncodes": returncodes}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import shutil
+import time
+
+import metrics
+
+
+def entry_key(name):
+    # "<hash>.png" 와 "<hash>.faces.npz" 처럼 첫 '.' 앞이 같은 파일은 함께 관리
+    return name if name.startswith(".") else name.split(".", 1)[0]
+
+
+def entry_stats(path):
+    """(bytes, last modified) of a file, or of everything under a folder."""
+    stat = os.stat(path)
+    if not os.path.isdir(path):
+        return stat.st_size, stat.st_mtime
+    size, mtime = 0, stat.st_mtime
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                file_stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            size += file_stat.st_size
+            mtime = max(mtime, file_stat.st_mtime)
+    return size, mtime
+
+
+class Area:
+    """One folder the janitor keeps in bounds.
+
+    Entries older than ``ttl`` seconds are deleted, then the least recently
+    modified ones until the folder is under ``max_bytes`` (0 means no
+    limit). Keys returned by ``pinned()`` are never touched.
+    """
+
+    def __init__(self, name, folder, ttl=0, max_bytes=0, pinned=None):
+        self.name = name
+        self.folder = os.path.abspath(folder)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.pinned = pinned or (lambda: set())
+
+
+class DiskJanitor:
+    """Background sweeper for uploads, outputs, job files and temp frames."""
+
+    def __init__(self, areas, interval=300):
+        self.areas = areas
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        print(f"[+] Disk janitor started for {', '.join(area.name for area in self.areas)} (every {self.interval:g}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.sweep()
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self):
+        # pin 목록은 event loop 에서 만들고 파일 작업은 thread 에서 처리
+        pinned = {area.name: set(area.pinned()) for area in self.areas}
+        for area in self.areas:
+            try:
+                await asyncio.to_thread(self.sweep_area, area, pinned[area.name])
+            except OSError as e:
+                print(f"[!] Disk janitor failed on {area.folder}: {e}")
+
+    def sweep_area(self, area, pinned):
+        if not os.path.isdir(area.folder):
+            return
+        groups = {}
+        for entry in os.scandir(area.folder):
+            try:
+                size, mtime = entry_stats(entry.path)
+            except OSError:
+                continue
+            group = groups.setdefault(entry_key(entry.name), {"paths": [], "bytes": 0, "mtime": 0})
+            group["paths"].append(entry.path)
+            group["bytes"] += size
+            group["mtime"] = max(group["mtime"], mtime)
+
+        now = time.time()
+        total = sum(group["bytes"] for group in groups.values())
+        # 오래 쓰이지 않은 것부터 (LRU)
+        for key, group in sorted(groups.items(), key=lambda item: item[1]["mtime"]):
+            if key in pinned:
+                continue
+            if area.ttl and now - group["mtime"] > area.ttl:
+                reason = "ttl"
+            elif area.max_bytes and total > area.max_bytes:
+                reason = "quota"
+            else:
+                continue
+            if self._remove(group["paths"]):
+                total -= group["bytes"]
+                metrics.DISK_EVICTED_BYTES.inc(group["bytes"], area=area.name, reason=reason)
+                del groups[key]
+
+        metrics.DISK_BYTES.set(total, area=area.name)
+        metrics.DISK_ENTRIES.set(len(groups), area=area.name)
+        metrics.DISK_FREE_BYTES.set(shutil.disk_usage(area.folder).free, area=area.name)
+
+    def _remove(self, paths):
+        try:
+            for path in paths:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+        except OSError as e:
+            # Windows 에서 사용 중인 파일 등은 다음 sweep 때 다시 시도
+            print(f"[!] Disk janitor could not remove {paths[0]}: {e}")
+            return False
+        print(f"[-] Disk janitor removed {os.path.basename(paths[0])}")
+        return True
@@ -0,0 +1,230 @@
+import asyncio
+import itertools
+import time
+import uuid
+from collections import OrderedDict, deque
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class Job:
+    def __init__(self, func, args, info, priority=0, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.info = info
+        self.priority = priority
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = asyncio.Event()
+        self.task = None
+        self.cancel_reason = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            **self.info,
+        }
+
+
+class JobQueue:
+    """In-process job queue served by a fixed pool of asyncio workers.
+
+    Jobs are coroutine functions called as ``func(job, *args)``; anything
+    blocking inside them must be pushed to a thread (``asyncio.to_thread``)
+    so the event loop keeps serving requests while a render is running.
+    Jobs with a lower ``priority`` are started first; equal priorities keep
+    their submission order. A running job is cancelled after ``timeout``
+    seconds, and ``cancel`` stops a job whether it is queued or running.
+    """
+
+    def __init__(self, worker_count=1, max_history=1000, name="jobs", on_finish=None, recent=50, timeout=None):
+        self.worker_count = max(1, worker_count)
+        self.timeout = timeout or None
+        self.max_history = max_history
+        self.name = name
+        self.on_finish = on_finish
+        self.jobs = OrderedDict()
+        # 최근 job 실행 시간 (대기 시간 추정용)
+        self.durations = deque(maxlen=recent)
+        self._queue = None
+        self._workers = []
+        self._sequence = itertools.count()
+        self.stopping = False
+
+    def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._worker(n)) for n in range(self.worker_count)]
+        print(f"[+] {self.name} queue started with {self.worker_count} worker(s)")
+
+    async def stop(self):
+        self.stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, func, *args, priority=0, job_id=None, **info):
+        job = Job(func, args, info, priority, job_id)
+        self.jobs[job.id] = job
+        self._queue.put_nowait((priority, next(self._sequence), job))
+        self._trim_history()
+        print(f"[+] Job {job.id} queued (priority {priority}, depth {self._queue.qsize()})")
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def depth(self, priority=None):
+        """Queued jobs, or only those that would start before one of ``priority``."""
+        return sum(
+            1 for job in self.jobs.values()
+            if job.status == QUEUED and (priority is None or job.priority <= priority)
+        )
+
+    def running(self):
+        return sum(1 for job in self.jobs.values() if job.status == RUNNING)
+
+    def pending(self, **info):
+        """Count unfinished jobs whose info matches all given values."""
+        return sum(
+            1 for job in self.jobs.values()
+            if job.status not in FINISHED_STATES and all(job.info.get(key) == value for key, value in info.items())
+        )
+
+    def estimate_wait(self, priority=None, default=10.0):
+        """Rough seconds until a job submitted now would start.
+
+        Uses the average of recent run times (``default`` until any job has
+        finished) and counts only queued jobs that would run before one of
+        the given priority.
+        """
+        average = sum(self.durations) / len(self.durations) if self.durations else default
+        return average * (self.depth(priority) + self.running()) / self.worker_count
+
+    def cancel(self, job_id, reason="cancelled"):
+        """Cancel a queued or running job; returns it (None if unknown).
+
+        A queued job is finished right away. A running job's task is
+        cancelled and the job finishes once the task has unwound, so wait
+        on ``job.done`` for the final status.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        job.cancel_reason = reason
+        if job.status == QUEUED:
+            job.status = CANCELLED
+            job.error = reason
+            job.finished_at = time.time()
+            self._finish(job)
+        elif job.task is not None:
+            job.task.cancel()
+        print(f"[-] Job {job.id} cancelled ({reason})")
+        return job
+
+    def cancel_all(self, reason="cancelled", **info):
+        """Cancel every unfinished job whose info matches all given values."""
+        jobs = [
+            job for job in self.jobs.values()
+            if job.status not in FINISHED_STATES and all(job.info.get(key) == value for key, value in info.items())
+        ]
+        return [self.cancel(job.id, reason) for job in jobs]
+
+    async def _worker(self, number):
+        while True:
+            _, _, job = await self._queue.get()
+            if job.status != QUEUED:
+                # 대기 중에 취소된 job
+                self._queue.task_done()
+                continue
+            job.status = RUNNING
+            job.started_at = time.time()
+            job.task = asyncio.create_task(job.func(job, *job.args))
+            try:
+                job.result = await asyncio.wait_for(job.task, self.timeout)
+                job.status = COMPLETED
+            except asyncio.CancelledError:
+                if job.cancel_reason is None or self.stopping:
+                    # queue 자체가 멈추는 중 (job 취소와 겹쳐도 worker 는 멈춰야 stop() 이 끝난다)
+                    job.status = FAILED if job.cancel_reason is None else CANCELLED
+                    job.error = job.cancel_reason or "cancelled"
+                    raise
+                job.status = CANCELLED
+                job.error = job.cancel_reason
+            except Exception as e:
+                job.status = FAILED
+                if job.task.cancelled():
+                    # wait_for 가 시간 초과로 task 를 취소한 경우
+                    job.error = f"timed out after {self.timeout:g}s"
+                else:
+                    job.error = str(e) or e.__class__.__name__
+                print(f"❌ Job {job.id} failed on worker {number}: {job.error}")
+            finally:
+                job.task = None
+                job.finished_at = time.time()
+                if job.status == COMPLETED:
+                    self.durations.append(job.finished_at - job.started_at)
+                self._queue.task_done()
+                self._finish(job)
+
+    def _finish(self, job):
+        job.done.set()
+        if self.on_finish is not None:
+            try:
+                self.on_finish(self, job)
+            except Exception as e:
+                print(f"[!] on_finish hook failed for job {job.id}: {e}")
+
+    def _trim_history(self):
+        if len(self.jobs) <= self.max_history:
+            return
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.max_history:
+                break
+            if self.jobs[job_id].status in FINISHED_STATES:
+                del self.jobs[job_id]
+
+
+class SingleFlight:
+    """Tracks renders in flight so identical requests wait instead of re-rendering.
+
+    The first caller ``claim``s a key and must ``release`` it when done; later
+    callers ``join`` it, wait on the returned event and then pick the output
+    up from the result cache.
+    """
+
+    def __init__(self):
+        self.inflight = {}
+        self.coalesced = 0
+
+    def join(self, key):
+        event = self.inflight.get(key)
+        if event is not None:
+            self.coalesced += 1
+        return event
+
+    def claim(self, key):
+        self.inflight[key] = asyncio.Event()
+
+    def release(self, key):
+        self.inflight.pop(key).set()
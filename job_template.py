@@ -0,0 +1,76 @@
+import copy
+import json
+import os
+import uuid
+from types import MappingProxyType
+
+# job 마다 반드시 채워야 하는 인자
+REQUIRED_ARGS = ("source_paths", "target_path", "output_path", "processors")
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class JobTemplate:
+    """FaceFusion job template parsed and validated once.
+
+    ``args`` is a read-only view of the template's first step. Per-job
+    overrides are checked against it: unknown keys and values whose type
+    does not match the template are rejected before any subprocess runs.
+    Each job file is then written to disk exactly once.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with open(self.path, "r", encoding="utf-8") as f:
+            job_data = json.load(f)
+
+        steps = job_data.get("steps") if isinstance(job_data, dict) else None
+        if not steps or not isinstance(steps[0].get("args"), dict):
+            raise TemplateError(f"{self.path} has no steps[0].args")
+        missing = [key for key in REQUIRED_ARGS if key not in steps[0]["args"]]
+        if missing:
+            raise TemplateError(f"{self.path} is missing job args: {', '.join(missing)}")
+
+        job_data["steps"] = steps[:1]
+        self._job = job_data
+        self.args = MappingProxyType(copy.deepcopy(steps[0]["args"]))
+        print(f"[+] Job template loaded from {self.path}")
+
+    def step(self, **overrides):
+        self.check(overrides)
+        step = copy.deepcopy(self._job["steps"][0])
+        step["args"].update(copy.deepcopy(overrides))
+        return step
+
+    def check(self, overrides):
+        for key, value in overrides.items():
+            if key not in self.args:
+                raise TemplateError(f"Unknown job arg: {key}")
+            expected = self.args[key]
+            if expected is None or value is None:
+                continue
+            if isinstance(expected, bool) or isinstance(value, bool):
+                valid = isinstance(expected, bool) and isinstance(value, bool)
+            elif isinstance(expected, (int, float)):
+                valid = isinstance(value, (int, float))
+            else:
+                valid = isinstance(value, type(expected))
+            if not valid:
+                raise TemplateError(f"Job arg {key} expects {type(expected).__name__}, got {type(value).__name__}")
+
+    def build(self, steps):
+        """Job data with one step per override dict."""
+        job_data = {key: value for key, value in self._job.items() if key != "steps"}
+        job_data["steps"] = [self.step(**overrides) for overrides in steps]
+        return job_data
+
+    def write(self, folder, steps, job_id=None):
+        job_data = self.build(steps)
+        job_id = job_id or uuid.uuid4().hex
+        os.makedirs(folder, exist_ok=True)
+        job_path = os.path.join(folder, f"{job_id}.json")
+        with open(job_path, "w", encoding="utf-8") as f:
+            json.dump(job_data, f, indent=4)
+        return job_id, job_path
@@ -0,0 +1,196 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# journal 상태: queued → running → rendered(전달 대기) → delivered, 실패 시 failed, 취소 시 cancelled
+# 결과 전달을 끝내 실패하면 rendered → delivery_failed (더 이상 다시 전달하지 않는다)
+QUEUED = "queued"
+RUNNING = "running"
+RENDERED = "rendered"
+DELIVERED = "delivered"
+DELIVERY_FAILED = "delivery_failed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+UNFINISHED_STATES = (QUEUED, RUNNING)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    session_id TEXT,
+    idx INTEGER,
+    priority INTEGER NOT NULL DEFAULT 0,
+    spec TEXT NOT NULL,
+    state TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_session ON jobs (session_id, idx);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+CREATE TABLE IF NOT EXISTS transitions (
+    job_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    at REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    job_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    delivered INTEGER NOT NULL DEFAULT 0,  -- 0 전달 대기, 1 전달됨, -1 전달 실패
+    PRIMARY KEY (job_id, path)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    source_path TEXT NOT NULL,
+    info TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class JobJournal:
+    """SQLite (WAL) record of jobs, their state transitions and outputs.
+
+    Everything the server needs to pick up after a crash or restart lives
+    here: the spec of each job, where its outputs were written and which
+    of them reached the main server.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def _write(self, *statements):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    self.db.execute(sql, params)
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def add(self, job_id, kind, spec, session_id=None, index=None, priority=0):
+        now = time.time()
+        self._write(
+            ("INSERT OR REPLACE INTO jobs (id, kind, session_id, idx, priority, spec, state, created_at, updated_at)"
+             " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+             (job_id, kind, session_id, index, priority, json.dumps(spec), QUEUED, now, now)),
+            ("INSERT INTO transitions (job_id, state, at) VALUES (?, ?, ?)", (job_id, QUEUED, now))
+        )
+
+    def transition(self, job_id, state, error=None):
+        now = time.time()
+        self._write(
+            ("UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE id = ?", (state, error, now, job_id)),
+            ("INSERT INTO transitions (job_id, state, at, error) VALUES (?, ?, ?, ?)", (job_id, state, now, error))
+        )
+
+    def add_output(self, job_id, path):
+        self._write(("INSERT OR IGNORE INTO outputs (job_id, path) VALUES (?, ?)", (job_id, path)))
+
+    def finish(self, job_id):
+        """Mark a job rendered, or delivered if all its outputs already are."""
+        self.transition(job_id, RENDERED)
+        self._settle(job_id)
+
+    def delivered(self, job_id, path):
+        self._write(("UPDATE outputs SET delivered = 1 WHERE job_id = ? AND path = ?", (job_id, path)))
+        self._settle(job_id)
+
+    def delivery_failed(self, job_id, path, error=None):
+        """Give up on delivering an output; it is no longer pinned or re-sent."""
+        self._write(("UPDATE outputs SET delivered = -1 WHERE job_id = ? AND path = ?", (job_id, path)))
+        self._settle(job_id, error)
+
+    def _settle(self, job_id, error=None):
+        rows = self._query(
+            "SELECT state, (SELECT COUNT(*) FROM outputs WHERE job_id = jobs.id AND delivered = 0) AS pending,"
+            " (SELECT COUNT(*) FROM outputs WHERE job_id = jobs.id AND delivered < 0) AS undeliverable"
+            " FROM jobs WHERE id = ?", (job_id,)
+        )
+        if not rows or rows[0]["state"] != RENDERED or rows[0]["pending"] > 0:
+            return
+        if rows[0]["undeliverable"]:
+            self.transition(job_id, DELIVERY_FAILED, error or "output could not be delivered")
+        else:
+            self.transition(job_id, DELIVERED)
+
+    def get(self, job_id):
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._job(rows[0]) if rows else None
+
+    def find(self, session_id, index, kind="index"):
+        """Latest job for (session, index) that has not failed or been cancelled."""
+        rows = self._query(
+            "SELECT * FROM jobs WHERE session_id = ? AND idx = ? AND kind = ? AND state NOT IN (?, ?)"
+            " ORDER BY created_at DESC LIMIT 1", (session_id, index, kind, FAILED, CANCELLED)
+        )
+        return self._job(rows[0]) if rows else None
+
+    def unfinished(self):
+        rows = self._query(
+            f"SELECT * FROM jobs WHERE state IN ({','.join('?' * len(UNFINISHED_STATES))}) ORDER BY created_at",
+            UNFINISHED_STATES
+        )
+        return [self._job(row) for row in rows]
+
+    def undelivered(self, since=0):
+        """(job_id, output path) pairs of rendered jobs still waiting for delivery.
+
+        ``since`` (a timestamp) leaves out jobs rendered before it.
+        """
+        rows = self._query(
+            "SELECT outputs.job_id, outputs.path FROM outputs JOIN jobs ON jobs.id = outputs.job_id"
+            " WHERE outputs.delivered = 0 AND jobs.state = ? AND jobs.updated_at >= ? ORDER BY jobs.created_at",
+            (RENDERED, since)
+        )
+        return [(row["job_id"], row["path"]) for row in rows]
+
+    def _job(self, row):
+        outputs = self._query("SELECT path, delivered FROM outputs WHERE job_id = ?", (row["id"],))
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "session_id": row["session_id"],
+            "index": row["idx"],
+            "priority": row["priority"],
+            "spec": json.loads(row["spec"]),
+            "state": row["state"],
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "outputs": {output["path"]: output["delivered"] > 0 for output in outputs}
+        }
+
+    def save_session(self, session):
+        self._write((
+            "INSERT OR REPLACE INTO sessions (id, source_path, info, created_at) VALUES (?, ?, ?, ?)",
+            (session.id, session.source_path, json.dumps(session.info), session.created_at)
+        ))
+
+    def remove_session(self, session_id):
+        self._write(("DELETE FROM sessions WHERE id = ?", (session_id,)))
+
+    def sessions(self):
+        rows = self._query("SELECT * FROM sessions")
+        return [(row["id"], row["source_path"], json.loads(row["info"]), row["created_at"]) for row in rows]
@@ -0,0 +1,151 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# 초 단위 stage 소요 시간 버킷 (짧은 API 처리부터 긴 렌더링까지)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            lines += self._samples()
+        return lines
+
+
+class Counter(Metric):
+    """Counter incremented directly or read from ``func`` at scrape time."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=(), func=None):
+        super().__init__(name, documentation, labels)
+        self.values = {} if self.label_names else {(): 0}
+        self.func = func
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def _samples(self):
+        if self.func is not None:
+            return [f"{self.name} {self.func()}"]
+        return [f"{self.name}{_labels(self.label_names, key)} {value}" for key, value in self.values.items()]
+
+
+class Gauge(Metric):
+    """Gauge set directly or read from ``func`` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=(), func=None):
+        super().__init__(name, documentation, labels)
+        self.values = {}
+        self.func = func
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def _samples(self):
+        if self.func is not None:
+            return [f"{self.name} {self.func()}"]
+        return [f"{self.name}{_labels(self.label_names, key)} {value}" for key, value in self.values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts, total, observations = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for number, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[number] += 1
+            self.values[key] = (counts, total + value, observations + 1)
+
+    def _samples(self):
+        lines = []
+        names = self.label_names + ("le",)
+        for key, (counts, total, observations) in self.values.items():
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {count}")
+            lines.append(f"{self.name}_bucket{_labels(names, key + ('+Inf',))} {observations}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {observations}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "ai_stage_seconds", "Time spent in each pipeline stage.", labels=("stage",)
+))
+JOBS = REGISTRY.register(Counter("ai_jobs_total", "Finished queue jobs by queue and status.", labels=("queue", "status")))
+REJECTED = REGISTRY.register(Counter(
+    "ai_requests_rejected_total", "Requests refused by admission control.", labels=("reason",)
+))
+UPLOADED_BYTES = REGISTRY.register(Counter("ai_uploaded_bytes_total", "Result bytes delivered to the main server."))
+SUBPROCESS_EXITS = REGISTRY.register(Counter(
+    "ai_subprocess_exits_total", "FaceFusion command exit codes.", labels=("command", "code")
+))
+DISK_BYTES = REGISTRY.register(Gauge("ai_disk_bytes", "Bytes held in each janitor-managed folder.", labels=("area",)))
+DISK_ENTRIES = REGISTRY.register(Gauge("ai_disk_entries", "Entries in each janitor-managed folder.", labels=("area",)))
+DISK_FREE_BYTES = REGISTRY.register(Gauge("ai_disk_free_bytes", "Free space on the disk holding each folder.", labels=("area",)))
+DISK_EVICTED_BYTES = REGISTRY.register(Counter(
+    "ai_disk_evicted_bytes_total", "Bytes removed by the disk janitor.", labels=("area", "reason")
+))
+
+
+@contextmanager
+def timed(stage, timings=None):
+    """Observe the duration of the block in ai_stage_seconds (and add it to ``timings``)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0) + elapsed, 4)
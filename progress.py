@@ -0,0 +1,78 @@
+import re
+import time
+
+# tqdm 진행 표시줄 예: "Processing:  45%|████▌     | 108/240 [00:12<00:15,  8.75frame/s, ...]"
+TQDM_PATTERN = re.compile(
+    r"(?P<stage>[A-Za-z][\w ]*?):\s*(?P<percent>\d+)%\|[^|]*\|\s*(?P<done>\d+)/(?P<total>\d+)"
+    r"\s*\[(?P<elapsed>[\d:]+)<(?P<eta>[\d:?]+),\s*(?P<rate>[^,\]]+)"
+)
+
+
+def _seconds(clock):
+    if "?" in clock:
+        return None
+    seconds = 0
+    for part in clock.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def _fps(rate):
+    # "8.75frame/s" 또는 느릴 때 "2.10s/frame"
+    number = re.match(r"[\d.]+", rate.strip())
+    if number is None:
+        return None
+    value = float(number.group())
+    if rate.strip().endswith("/s"):
+        return value
+    return round(1 / value, 3) if value else None
+
+
+def parse_progress(line):
+    match = None
+    for match in TQDM_PATTERN.finditer(line):
+        pass
+    if match is None:
+        return None
+    return {
+        "stage": match.group("stage").strip().lower(),
+        "percent": int(match.group("percent")),
+        "frames": int(match.group("done")),
+        "total_frames": int(match.group("total")),
+        "fps": _fps(match.group("rate")),
+        "eta_seconds": _seconds(match.group("eta"))
+    }
+
+
+class ProgressReporter:
+    """Keeps ``info["progress"]`` up to date from FaceFusion output lines.
+
+    Segmented renders run several processes at once; each reports as its
+    own part and the parts are merged into one figure for the job.
+    """
+
+    def __init__(self, info):
+        self.info = info
+        self.parts = {}
+
+    def callback(self, part=0):
+        return lambda line: self.update(part, line)
+
+    def update(self, part, line):
+        progress = parse_progress(line)
+        if progress is None:
+            return False
+        self.parts[part] = progress
+        if len(self.parts) > 1:
+            parts = list(self.parts.values())
+            progress = {
+                "stage": progress["stage"],
+                "percent": sum(p["percent"] for p in parts) // len(parts),
+                "frames": sum(p["frames"] for p in parts),
+                "total_frames": sum(p["total_frames"] for p in parts),
+                "fps": round(sum(p["fps"] or 0 for p in parts), 3),
+                "eta_seconds": max((p["eta_seconds"] or 0 for p in parts), default=None),
+                "parts": len(parts)
+            }
+        self.info["progress"] = {**progress, "updated_at": time.time()}
+        return True
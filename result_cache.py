@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+from face_cache import file_hash
+
+# 결과물 위치에 따라 달라지는 인자는 키에서 제외
+PATH_ARGS = ("source_paths", "target_path", "output_path")
+
+
+def result_key(source_path, target_path, template, settings):
+    args = {key: value for key, value in template.args.items() if key not in PATH_ARGS}
+    digest = hashlib.sha256()
+    digest.update(file_hash(source_path).encode())
+    digest.update(file_hash(target_path).encode())
+    digest.update(json.dumps({"args": args, "settings": settings}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def place(src, dst):
+    # 같은 디스크면 hard link, 아니면 복사 (dst 는 항상 새 파일)
+    if os.path.exists(dst):
+        os.remove(dst)
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache:
+    """Size-bounded LRU of rendered outputs keyed by ``result_key``."""
+
+    def __init__(self, folder, max_bytes):
+        self.folder = os.path.abspath(folder)
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        paths = [os.path.join(self.folder, name) for name in os.listdir(self.folder) if name.endswith(".mp4")]
+        for path in sorted(paths, key=os.path.getmtime):
+            key = os.path.splitext(os.path.basename(path))[0]
+            size = os.path.getsize(path)
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def path(self, key):
+        return os.path.join(self.folder, f"{key}.mp4")
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries and os.path.exists(self.path(key))
+
+    def fetch(self, key, output_path, count=True):
+        """Place a cached result at output_path. Returns False on a miss.
+
+        Pass ``count=False`` for a re-check of a key already looked up, so
+        it does not show up twice in the hit/miss counters.
+        """
+        with self.lock:
+            if key not in self.entries or not os.path.exists(self.path(key)):
+                if count:
+                    self.misses += 1
+                return False
+            self.entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            os.utime(self.path(key))
+            place(self.path(key), output_path)
+            return True
+
+    def put(self, key, output_path):
+        if not os.path.exists(output_path):
+            return
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)
+            place(output_path, self.path(key))
+            size = os.path.getsize(self.path(key))
+            self.entries[key] = size
+            self.total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            if os.path.exists(self.path(key)):
+                os.remove(self.path(key))
+            print(f"[-] Result cache evicted {key}")
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+import face_cache
+import metrics
+from facefusion_worker import WarmWorkerPool, execution_args, kill_process_tree, temp_env
+
+
+class Runner:
+    """Executes drafted FaceFusion jobs.
+
+    Every backend takes the same tuning: ``execution_settings`` are passed
+    to ``job-run`` as ``--key value`` flags (execution provider, thread and
+    queue count), and ``workers`` is the number of jobs it may run at once.
+    Runners that start a process per FaceFusion job (spawn, fake) allow
+    ``render_slots`` of them at once instead, so the segments of one job
+    can run side by side; it defaults to ``workers``.
+    FaceFusion's temp frames go to a folder of their own under
+    ``temp_folder`` so a cancelled job can be cleaned up.
+    """
+
+    name = None
+
+    def __init__(self, template, drafted_folder, execution_settings=None, python_path=None,
+                 cwd="facefusion", env=None, workers=1, temp_folder=None, render_slots=None):
+        self.template = template
+        self.drafted_folder = drafted_folder
+        self.execution_settings = dict(execution_settings or {})
+        self.python_path = python_path
+        self.cwd = cwd
+        self.env = env
+        self.workers = max(1, workers)
+        self.render_slots = max(1, render_slots or self.workers)
+        self.temp_folder = os.path.abspath(temp_folder or os.path.join(tempfile.gettempdir(), "facefusion-jobs"))
+
+    def start(self):
+        print(f"[+] {self.name} runner ready with settings: {self.execution_settings}")
+
+    def stop(self):
+        pass
+
+    async def run(self, job_id, target_paths=(), source_path=None, on_output=None):
+        """Run a drafted job; on_output(line) receives FaceFusion's console output as it is written."""
+        raise NotImplementedError
+
+    async def precompute(self, target_paths, settings=None):
+        print(f"[=] Face cache precompute is not supported by the {self.name} runner")
+
+    def temp_in_use(self):
+        """Names under ``temp_folder`` that belong to running jobs or workers."""
+        return set()
+
+    def cleanup(self, job_id):
+        # 중단된 job 의 temp frame 과 .jobs 에 남은 job 파일 정리
+        shutil.rmtree(os.path.join(self.temp_folder, job_id), ignore_errors=True)
+        jobs_path = os.path.dirname(self.drafted_folder)
+        for status in ("drafted", "queued"):
+            job_path = os.path.join(jobs_path, status, f"{job_id}.json")
+            if os.path.exists(job_path):
+                os.remove(job_path)
+
+
+class SubprocessRunner(Runner):
+    """Runs ``facefusion.py job-submit`` and ``job-run`` as child processes per job."""
+
+    name = "spawn"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.processes = {}
+        self.cancelled = set()
+        # kill() 과 프로세스 등록이 엇갈려도 둘 중 한쪽은 반드시 종료하도록 함께 잠근다
+        self.lock = threading.Lock()
+        self._slots = None
+
+    def start(self):
+        # segment 로 나뉜 job 도 같은 slot 을 나눠 쓴다 (동시에 뜨는 facefusion 은 최대 render_slots 개)
+        self._slots = asyncio.Semaphore(self.render_slots)
+        super().start()
+
+    def run_sync(self, job_id, on_output=None):
+        commands = (["job-submit", job_id], ["job-run", job_id] + execution_args(self.execution_settings))
+        try:
+            for command in commands:
+                if job_id in self.cancelled:
+                    raise RuntimeError(f"{job_id} was cancelled")
+                with metrics.timed(command[0].replace("-", "_")):
+                    returncode = self._call(job_id, [self.python_path or "python", "facefusion.py"] + command, on_output)
+                metrics.SUBPROCESS_EXITS.inc(command=command[0], code=returncode)
+                if job_id in self.cancelled:
+                    raise RuntimeError(f"{job_id} was cancelled")
+                if returncode != 0:
+                    raise RuntimeError(f"{command[0]} failed for {job_id} (exit {returncode})")
+        finally:
+            with self.lock:
+                self.cancelled.discard(job_id)
+            self.cleanup(job_id)
+        print(f"[+] Job {job_id} executed with settings: {self.execution_settings}")
+
+    def _call(self, job_id, command, on_output):
+        # 끝날 때까지 기다리지 않고 출력(tqdm 진행률 포함)을 줄 단위로 바로 읽는다
+        process = subprocess.Popen(
+            command,
+            cwd=self.cwd,
+            env=temp_env(self.env, os.path.join(self.temp_folder, job_id)),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            start_new_session=True
+        )
+        with self.lock:
+            self.processes[job_id] = process
+            if job_id in self.cancelled:
+                # 프로세스가 등록되기 전에 취소된 경우
+                kill_process_tree(process)
+        try:
+            for line in process.stdout:
+                handle_output(line, on_output)
+            return process.wait()
+        finally:
+            self.processes.pop(job_id, None)
+
+    def temp_in_use(self):
+        return set(self.processes)
+
+    def kill(self, job_id):
+        with self.lock:
+            self.cancelled.add(job_id)
+            process = self.processes.get(job_id)
+            if process is not None:
+                kill_process_tree(process)
+
+    async def run(self, job_id, target_paths=(), source_path=None, on_output=None):
+        async with self._slots:
+            try:
+                await asyncio.to_thread(self.run_sync, job_id, on_output)
+            except asyncio.CancelledError:
+                # thread 는 취소되지 않으므로 프로세스를 직접 종료 (정리는 run_sync 가 마무리)
+                self.kill(job_id)
+                raise
+
+
+class WarmRunner(Runner):
+    """Hands jobs to resident ``facefusion_worker.py`` processes."""
+
+    name = "warm"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = WarmWorkerPool(size=self.workers, python_path=self.python_path, cwd=self.cwd, env=self.env,
+                                   temp_folder=self.temp_folder)
+
+    def start(self):
+        self.pool.start()
+        super().start()
+
+    def stop(self):
+        self.pool.stop()
+
+    def temp_in_use(self):
+        return {os.path.basename(worker.temp_path) for worker in self.pool.workers if worker.temp_path}
+
+    async def run(self, job_id, target_paths=(), source_path=None, on_output=None):
+        job_path = os.path.join(self.drafted_folder, f"{job_id}.json")
+        options = await asyncio.to_thread(face_cache.job_options, job_path, source_path)
+        try:
+            await self.pool.run(job_id, self.execution_settings, on_output=on_output, **options)
+        except asyncio.CancelledError:
+            self.pool.cancel(job_id)
+            self.cleanup(job_id)
+            raise
+
+    async def precompute(self, target_paths, settings=None):
+        await face_cache.precompute(self.pool, self.template, self.drafted_folder, target_paths,
+                                     self.execution_settings, settings)
+
+
+class FakeRunner(Runner):
+    """Stand-in for FaceFusion in tests and benchmarks.
+
+    Each step's target is copied to its output after ``delay`` seconds, so
+    the whole request path runs without models or a GPU.
+    """
+
+    name = "fake"
+
+    def __init__(self, *args, delay=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delay = delay
+        self._slots = None
+
+    def start(self):
+        self._slots = asyncio.Semaphore(self.render_slots)
+        super().start()
+
+    async def run(self, job_id, target_paths=(), source_path=None, on_output=None):
+        job_path = os.path.join(self.drafted_folder, f"{job_id}.json")
+        with open(job_path, "r") as f:
+            steps = json.load(f)["steps"]
+        try:
+            await self._render(steps, on_output)
+        except asyncio.CancelledError:
+            self.cleanup(job_id)
+            raise
+        # facefusion 처럼 끝난 job 파일을 .jobs/completed 로 옮긴다
+        completed_folder = os.path.join(os.path.dirname(self.drafted_folder), "completed")
+        os.makedirs(completed_folder, exist_ok=True)
+        os.replace(job_path, os.path.join(completed_folder, f"{job_id}.json"))
+        print(f"[+] Job {job_id} faked ({len(steps)} steps)")
+
+    async def _render(self, steps, on_output):
+        async with self._slots:
+            for step in steps:
+                for done in range(1, 5):
+                    await asyncio.sleep(self.delay / 4)
+                    if on_output is not None:
+                        on_output(f"Processing: {done * 25}%|| {done * 6}/24 [00:0{done}<00:0{4 - done}, 6.00frame/s]")
+                args = step["args"]
+                os.makedirs(os.path.dirname(os.path.abspath(args["output_path"])), exist_ok=True)
+                await asyncio.to_thread(shutil.copyfile, args["target_path"], args["output_path"])
+
+
+def handle_output(line, on_output=None):
+    # 진행률 줄은 callback 으로만 넘기고 나머지는 그대로 로그에 남긴다
+    if not line.strip() or (on_output is not None and on_output(line)):
+        return
+    print(line.rstrip(), flush=True)
+
+
+RUNNERS = {runner.name: runner for runner in (SubprocessRunner, WarmRunner, FakeRunner)}
+
+
+def create_runner(mode, *args, **kwargs):
+    if mode not in RUNNERS:
+        raise ValueError(f"Unknown runner {mode!r} (expected one of: {', '.join(RUNNERS)})")
+    return RUNNERS[mode](*args, **kwargs)
@@ -0,0 +1,60 @@
+import os
+import subprocess
+import uuid
+
+FFMPEG = os.getenv("AI_FFMPEG", "ffmpeg")
+FFPROBE = os.getenv("AI_FFPROBE", "ffprobe")
+
+_FRAME_COUNTS = {}
+
+
+def frame_count(video_path):
+    stat = os.stat(video_path)
+    memo_key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _FRAME_COUNTS:
+        # 컨테이너 정보(nb_frames)가 없으면 패킷 수를 센다
+        for entry, extra in (("nb_frames", []), ("nb_read_packets", ["-count_packets"])):
+            result = subprocess.run(
+                [FFPROBE, "-v", "error", "-select_streams", "v:0", *extra,
+                 "-show_entries", f"stream={entry}", "-of", "csv=p=0", video_path],
+                capture_output=True, text=True
+            )
+            value = result.stdout.strip().split(",")[0]
+            if result.returncode == 0 and value.isdigit() and int(value) > 0:
+                _FRAME_COUNTS[memo_key] = int(value)
+                break
+        else:
+            raise RuntimeError(f"could not count frames of {video_path}")
+    return _FRAME_COUNTS[memo_key]
+
+
+def frame_ranges(total_frames, segments, min_frames=48):
+    """Split [0, total_frames) into at most ``segments`` contiguous ranges."""
+    segments = max(1, min(segments, total_frames // max(1, min_frames)))
+    bounds = [total_frames * number // segments for number in range(segments + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def segment_path(output_path, number):
+    stem, extension = os.path.splitext(os.path.abspath(output_path))
+    return f"{stem}.part{number}{extension}"
+
+
+def concat(segment_paths, target_path, output_path):
+    # 영상은 재인코딩 없이 이어 붙이고 오디오는 원본 target 에서 그대로 가져온다
+    list_path = f"{os.path.abspath(output_path)}.{uuid.uuid4().hex[:8]}.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        result = subprocess.run(
+            [FFMPEG, "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path, "-i", target_path,
+             "-map", "0:v:0", "-map", "1:a:0?", "-c", "copy", "-shortest", "-movflags", "+faststart", output_path],
+            capture_output=True, text=True
+        )
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        raise RuntimeError(f"segment concat failed for {output_path}: {result.stderr.strip()}")
+    print(f"[+] Joined {len(segment_paths)} segments into {output_path}")
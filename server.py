@@ -0,0 +1,886 @@
+from fastapi import FastAPI, UploadFile, File, Form, Request, HTTPException, Depends
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
+from dotenv import load_dotenv
+from typing import Optional
+import os
+import asyncio
+import json
+import math
+import time
+from job_queue import JobQueue, SingleFlight, FINISHED_STATES, COMPLETED, CANCELLED
+from sessions import SessionStore
+from journal import JobJournal
+from upload_store import UploadStore, UploadError, ContentLengthLimit
+from result_cache import ResultCache, result_key
+from uploader import ResultUploader
+from job_template import JobTemplate
+from runners import create_runner
+from janitor import Area, DiskJanitor, entry_key
+import segments
+import completion
+import journal
+from downloads import ResultFileResponse, etag_for, etag_matches
+from progress import ProgressReporter
+import metrics
+
+app = FastAPI()
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+load_dotenv()
+
+CUDA_JOB_SETTINGS = {
+    "processors": ["face_swapper", "face_enhancer"],
+    "face_swapper_model": "inswapper_128_fp16",
+    "face_enhancer_model": "gfpgan_1.4",
+    "face_detector_model": "scrfd"
+}
+
+# 서버(장비)별 차이는 profile 로만 관리 (AI_PROFILE 로 선택)
+PROFILES = {
+    "cuda": {
+        "template": "basic4.json",
+        "targets": [
+            "D:/AiServerTemp/AiServer/target1.mp4", "D:/AiServerTemp/AiServer/target2.mp4",
+            "D:/AiServerTemp/AiServer/target3.mp4", "D:/AiServerTemp/AiServer/target4.mp4",
+            "D:/AiServerTemp/AiServer/target1.mp4", "D:/AiServerTemp/AiServer/target2.mp4",
+            "D:/AiServerTemp/AiServer/target3.mp4", "D:/AiServerTemp/AiServer/target4.mp4"
+        ],
+        "output_folder": "D:/AiServerTemp/AiServer/outputs/",
+        "execution_provider": "cuda",
+        "python_path": r"C:\Users\user\miniconda3\python.exe",
+        "cuda_path": r"C:\Program Files\NVIDIA GPU Computing Toolkit\CUDA\v12.2",
+        # 템플릿의 processor/model 설정을 그대로 사용
+        "job_settings": {}
+    },
+    "cuda-run": {
+        "template": "basic4.json",
+        "targets": [
+            "C:/AiServer/AiServer/target1.mp4", "C:/AiServer/AiServer/target2.mp4",
+            "C:/AiServer/AiServer/target2.mp4", "C:/AiServer/AiServer/target3.mp4",
+            "C:/AiServer/AiServer/target3.mp4", "C:/AiServer/AiServer/target4.mp4",
+            "C:/AiServer/AiServer/target4.mp4", "C:/AiServer/AiServer/target5.mp4"
+        ],
+        "output_folder": "C:/AiServer/AiServer/outputs/",
+        "execution_provider": "cuda",
+        "job_settings": CUDA_JOB_SETTINGS
+    },
+    "cuda-run2": {
+        "template": "basic4.json",
+        "targets": [
+            "C:/AiServer/target1.mp4", "C:/AiServer/target2.mp4",
+            "C:/AiServer/target2.mp4", "C:/AiServer/target3.mp4",
+            "C:/AiServer/target3.mp4", "C:/AiServer/target4.mp4",
+            "C:/AiServer/target4.mp4", "C:/AiServer/target5.mp4"
+        ],
+        "output_folder": "C:/AiServer/outputs/",
+        "execution_provider": "cuda",
+        "job_settings": CUDA_JOB_SETTINGS,
+        "require_gender": True
+    },
+    "coreml": {
+        "template": "basic.json",
+        "targets": ["target1.mp4", "target2.mp4", "target3.mp4", "target4.mp4"],
+        "output_folder": "outputs/",
+        "output_name": "output_{index}_{target}",
+        "execution_provider": "coreml",
+        "job_settings": CUDA_JOB_SETTINGS
+    }
+}
+
+PROFILE_NAME = os.getenv("AI_PROFILE", "cuda-run")
+if PROFILE_NAME not in PROFILES:
+    raise ValueError(f"알 수 없는 AI_PROFILE 입니다: {PROFILE_NAME}")
+PROFILE = PROFILES[PROFILE_NAME]
+
+MAIN_SERVER_IP_URL = os.getenv("MAIN_SERVER_IP_URL")
+UPLOAD_FOLDER = "uploads/"
+OUTPUT_FOLDER = os.getenv("AI_OUTPUT_FOLDER", PROFILE["output_folder"])
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+BASIC_JOB_PATH = os.getenv("AI_JOB_TEMPLATE", os.path.join(PROJECT_ROOT, "facefusion", ".jobs", "queued", PROFILE["template"]))
+DRAFTED_FOLDER = os.getenv("AI_DRAFTED_FOLDER", os.path.join(PROJECT_ROOT, "facefusion", ".jobs", "drafted"))
+JOBS_PATH = os.path.dirname(DRAFTED_FOLDER)
+# job 종료 후 결과 파일이 완성될 때까지 기다리는 최대 시간
+OUTPUT_WAIT_TIMEOUT = float(os.getenv("AI_OUTPUT_WAIT_TIMEOUT", "30"))
+TARGET_VIDEO_PATHS = os.getenv("AI_TARGET_VIDEOS").split(",") if os.getenv("AI_TARGET_VIDEOS") else PROFILE["targets"]
+
+def record_job(queue, job):
+    # job 이 끝날 때마다 metric 을 기록하고 JSON 한 줄로 로그를 남긴다
+    metrics.JOBS.inc(queue=queue.name, status=job.status)
+    queue_seconds = (job.started_at or job.finished_at) - job.created_at
+    metrics.STAGE_SECONDS.observe(queue_seconds, stage=f"{queue.name}_queue_wait")
+    record = {
+        "event": "job",
+        "queue": queue.name,
+        "job_id": job.id,
+        "status": job.status,
+        "error": job.error,
+        "queue_seconds": round(queue_seconds, 4),
+        "run_seconds": round(job.finished_at - job.started_at, 4) if job.started_at else None,
+        **{key: job.info[key] for key in ("index", "indices", "session_id", "preview", "render_job_id", "timings") if key in job.info}
+    }
+    print(json.dumps(record), flush=True)
+
+def finish_render_job(queue, job):
+    record_job(queue, job)
+    # 서버 종료로 중단된 job 은 journal 에 실행 중으로 남겨 재시작 시 이어서 처리
+    if queue.stopping:
+        return
+    if job.status == COMPLETED:
+        JOURNAL.finish(job.id)
+    elif job.status == CANCELLED:
+        JOURNAL.transition(job.id, journal.CANCELLED, job.error)
+    else:
+        JOURNAL.transition(job.id, journal.FAILED, job.error)
+
+# job spec, 상태 변화, 결과 위치를 기록해 재시작 후 복구 (SQLite WAL)
+JOURNAL = JobJournal(os.getenv("AI_JOURNAL_PATH", "journal.db"))
+# 사용자별 source 이미지 상태 (TTL 동안 유지)
+SESSIONS = SessionStore(ttl=int(os.getenv("AI_SESSION_TTL", "1800")), journal=JOURNAL)
+
+# job 하나가 이 시간(초)을 넘기면 facefusion 프로세스를 종료하고 실패 처리 (0 이면 제한 없음)
+JOB_TIMEOUT = float(os.getenv("AI_JOB_TIMEOUT", "1800"))
+JOB_QUEUE = JobQueue(worker_count=int(os.getenv("AI_WORKER_COUNT", "1")), name="render",
+                     on_finish=finish_render_job, timeout=JOB_TIMEOUT)
+RENDERS = SingleFlight()
+# 결과 업로드를 별도 큐에서 처리해 렌더 워커가 바로 다음 job 을 시작하도록 한다
+PIPELINED_DELIVERY = os.getenv("AI_PIPELINED_DELIVERY", "1") == "1"
+DELIVERY_QUEUE = JobQueue(worker_count=int(os.getenv("AI_UPLOAD_WORKERS", "2")), name="delivery", on_finish=record_job)
+# 우선순위 lane (작을수록 먼저 실행): preview 가 일반 요청과 batch 보다 먼저 처리된다
+PRIORITY_LANES = {"preview": 0, "interactive": 1, "batch": 2}
+# 포화 상태면 요청을 기다리게 하지 않고 바로 429/503 + Retry-After 로 거절 (0 이면 제한 없음)
+MAX_QUEUE_DEPTH = int(os.getenv("AI_MAX_QUEUE_DEPTH", "64"))
+MAX_SESSION_JOBS = int(os.getenv("AI_MAX_SESSION_JOBS", "16"))
+# 완료된 job 이 아직 없을 때 Retry-After 계산에 쓰는 job 1개 예상 시간(초)
+EXPECTED_JOB_SECONDS = float(os.getenv("AI_EXPECTED_JOB_SECONDS", "30"))
+
+JOB_SETTINGS = PROFILE["job_settings"]
+# temp frame 방식: "disk" 는 템플릿 형식(png) 그대로, "raw" 는 압축/해제 비용이 없는 bmp
+FRAME_MODES = {
+    "disk": {},
+    "raw": {"temp_frame_format": "bmp"}
+}
+FRAME_MODE = os.getenv("AI_FRAME_MODE", "disk")
+if FRAME_MODE not in FRAME_MODES:
+    raise ValueError(f"알 수 없는 AI_FRAME_MODE 입니다: {FRAME_MODE}")
+# temp frame 을 RAM 디스크(/dev/shm, tmpfs 등)에 두려면 경로 지정 (기본은 시스템 temp 폴더)
+FRAME_TEMP_PATH = os.getenv("AI_FRAME_TEMP_PATH")
+# preview: enhancer 없이 저해상도로 먼저 렌더링해 전달하고, 원본 화질은 후속 job 으로 처리
+PREVIEW = os.getenv("AI_PREVIEW", "0") == "1"
+PREVIEW_SETTINGS = {
+    "processors": ["face_swapper"],
+    "output_video_resolution": os.getenv("AI_PREVIEW_RESOLUTION", "640x360"),
+    "output_video_quality": int(os.getenv("AI_PREVIEW_QUALITY", "50"))
+}
+# 1 보다 크면 target 을 frame 구간으로 나눠 동시에 렌더링한 뒤 이어 붙인다
+SEGMENT_COUNT = int(os.getenv("AI_SEGMENTS", "1"))
+EXECUTION_SETTINGS = {
+    "execution-providers": os.getenv("AI_EXECUTION_PROVIDERS", PROFILE["execution_provider"])
+}
+if os.getenv("AI_EXECUTION_THREADS"):
+    EXECUTION_SETTINGS["execution-thread-count"] = int(os.getenv("AI_EXECUTION_THREADS"))
+if os.getenv("AI_EXECUTION_QUEUES"):
+    EXECUTION_SETTINGS["execution-queue-count"] = int(os.getenv("AI_EXECUTION_QUEUES"))
+
+FACEFUSION_PYTHON_PATH = os.getenv("AI_FACEFUSION_PYTHON", PROFILE.get("python_path"))
+
+# "spawn": job 마다 facefusion.py 실행, "warm": 상주 워커에 job 전달, "fake": 테스트용
+RUNNER_MODE = os.getenv("AI_RUNNER_MODE", "spawn")
+RUNNER = None
+# 시작 시 한 번 읽어 검증한 job 템플릿
+JOB_TEMPLATE = None
+
+if MAIN_SERVER_IP_URL is None:
+    raise ValueError("MAIN_SERVER_IP_URL 환경변수가 설정되지 않았습니다.")
+
+MAIN_SERVER_UPLOAD_URL = os.getenv("MAIN_SERVER_UPLOAD_URL", f"http://{MAIN_SERVER_IP_URL}:8000/upload_result/")
+UPLOADER = ResultUploader(
+    MAIN_SERVER_UPLOAD_URL,
+    chunked_url=os.getenv("MAIN_SERVER_CHUNKED_UPLOAD_URL"),
+    timeout=float(os.getenv("AI_UPLOAD_TIMEOUT", "200")),
+    retries=int(os.getenv("AI_UPLOAD_RETRIES", "5"))
+)
+
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# source 이미지 업로드 최대 크기 (0 이면 제한 없음)
+MAX_UPLOAD_BYTES = int(float(os.getenv("AI_UPLOAD_MAX_MB", "20")) * 1024 * 1024)
+# max_side 는 시작 시 템플릿의 face_detector_size 로 정한다 (upload_max_side 참고)
+UPLOAD_STORE = UploadStore(UPLOAD_FOLDER, max_bytes=MAX_UPLOAD_BYTES)
+app.add_middleware(ContentLengthLimit, max_bytes=MAX_UPLOAD_BYTES)
+RESULT_CACHE = ResultCache(os.getenv("AI_RESULT_CACHE_FOLDER", "result_cache/"),
+                           max_bytes=int(os.getenv("AI_RESULT_CACHE_MB", "2048")) * 1024 * 1024)
+os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+JANITOR = None
+
+def verify_api_key(request: Request):
+    api_key = request.headers.get("X-API-KEY")
+    expected_key = os.getenv("API_KEY")
+    if api_key != expected_key:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+def job_template():
+    global JOB_TEMPLATE
+    if JOB_TEMPLATE is None:
+        JOB_TEMPLATE = JobTemplate(BASIC_JOB_PATH)
+        JOB_TEMPLATE.check(JOB_SETTINGS)
+        JOB_TEMPLATE.check(PREVIEW_SETTINGS)
+        for frame_settings in FRAME_MODES.values():
+            JOB_TEMPLATE.check(frame_settings)
+    return JOB_TEMPLATE
+
+def job_args(source_path, target_path, output_path, settings=None, frame_mode=None):
+    frame_mode = frame_mode or FRAME_MODE
+    if frame_mode not in FRAME_MODES:
+        raise ValueError(f"Unknown frame mode: {frame_mode}")
+    return {
+        "source_paths": [os.path.abspath(source_path)],
+        "target_path": os.path.abspath(target_path),
+        "output_path": os.path.abspath(output_path),
+        **(JOB_SETTINGS if settings is None else settings),
+        **FRAME_MODES[frame_mode]
+    }
+
+def create_job_from_basic(source_path, target_path, output_path, settings=None, frame_mode=None):
+    job_id, job_path = job_template().write(
+        DRAFTED_FOLDER, [job_args(source_path, target_path, output_path, settings, frame_mode)]
+    )
+
+    print(f"[+] Job file created at {job_path}")
+    return job_id, os.path.abspath(output_path)
+
+def create_batch_job_from_basic(source_path, targets, settings=None, frame_mode=None):
+    # target 별 step 을 하나의 job 에 담아 한 프로세스에서 source 얼굴 분석을 공유
+    steps = [job_args(source_path, target_path, output_path, settings, frame_mode) for target_path, output_path in targets]
+    job_id, job_path = job_template().write(DRAFTED_FOLDER, steps)
+
+    print(f"[+] Batch job file created at {job_path} ({len(targets)} steps)")
+    return job_id
+
+def facefusion_env():
+    cuda_path = PROFILE.get("cuda_path")
+    if cuda_path is None:
+        return None
+    env = os.environ.copy()
+    # 서버 가상환경(.venv)을 PATH 에서 빼고 facefusion 용 CUDA 경로 지정
+    env["PATH"] = os.pathsep.join([p for p in env["PATH"].split(os.pathsep) if ".venv" not in p])
+    env["CUDA_PATH"] = cuda_path
+    env["CUDA_HOME"] = cuda_path
+    return env
+
+def upload_max_side():
+    # 얼굴 검출기는 이미지를 face_detector_size (예: 640x640) 로 줄여서 보므로 그보다 큰 사진은 미리 줄인다
+    # AI_UPLOAD_MAX_SIDE 로 직접 지정 가능 (0 이면 줄이지 않음)
+    if os.getenv("AI_UPLOAD_MAX_SIDE") is not None:
+        return int(os.getenv("AI_UPLOAD_MAX_SIDE"))
+    detector_size = job_template().args.get("face_detector_size") or "0x0"
+    return max(int(n) for n in str(detector_size).split("x"))
+
+def runner_options():
+    workers = int(os.getenv("AI_WARM_WORKERS", os.getenv("AI_WORKER_COUNT", "1")))
+    options = {
+        "execution_settings": EXECUTION_SETTINGS,
+        "python_path": FACEFUSION_PYTHON_PATH,
+        "env": facefusion_env(),
+        "workers": workers,
+        # 동시에 띄울 facefusion 프로세스 수 (기본: job 당 segment 수만큼, 동시 job 수와 따로 조정)
+        "render_slots": int(os.getenv("AI_RENDER_SLOTS", str(workers * max(1, SEGMENT_COUNT)))),
+        # job 마다 이 폴더 아래에 temp frame 폴더를 따로 만든다 (RAM 디스크 경로 지정 가능)
+        "temp_folder": FRAME_TEMP_PATH
+    }
+    if RUNNER_MODE == "fake":
+        options["delay"] = float(os.getenv("AI_FAKE_RENDER_SECONDS", "0"))
+    return options
+
+def run_facefusion_with_job(job_id, execution_settings=None):
+    options = runner_options()
+    options["execution_settings"] = execution_settings
+    create_runner("spawn", job_template(), DRAFTED_FOLDER, **options).run_sync(job_id)
+
+async def send_output_to_main_server(file_path, progress=None):
+    await UPLOADER.send(file_path, progress)
+    print(f"[+] Sent result to main server")
+    print(f"[+] result path is {file_path}")
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    global RUNNER
+    RUNNER = create_runner(RUNNER_MODE, job_template(), DRAFTED_FOLDER, **runner_options())
+    UPLOAD_STORE.max_side = upload_max_side()
+    RUNNER.start()
+    print(f"[+] AI server profile: {PROFILE_NAME}")
+    if os.getenv("AI_FACE_CACHE_PRECOMPUTE") == "1":
+        # job 과 같은 워커를 동시에 쓰지 않도록 queue 를 시작하기 전에 끝낸다
+        try:
+            await RUNNER.precompute(TARGET_VIDEO_PATHS, {**JOB_SETTINGS, **FRAME_MODES[FRAME_MODE]})
+        except Exception as e:
+            print(f"❌ Face cache precompute failed: {e}")
+    JOB_QUEUE.start()
+    DELIVERY_QUEUE.start()
+    recover_jobs()
+    global JANITOR
+    JANITOR = DiskJanitor(janitor_areas(), interval=float(os.getenv("AI_JANITOR_INTERVAL", "300")))
+    JANITOR.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    if JANITOR is not None:
+        await JANITOR.stop()
+    await JOB_QUEUE.stop()
+    await DELIVERY_QUEUE.stop()
+    await UPLOADER.close()
+    if RUNNER is not None:
+        RUNNER.stop()
+    JOURNAL.close()
+
+
+def janitor_limits(area, ttl, quota_mb=0):
+    # AI_<AREA>_TTL(초), AI_<AREA>_QUOTA_MB 로 조정 (0 이면 제한 없음)
+    prefix = f"AI_{area.upper()}"
+    return {
+        "ttl": float(os.getenv(f"{prefix}_TTL", str(ttl))),
+        "max_bytes": int(float(os.getenv(f"{prefix}_QUOTA_MB", str(quota_mb))) * 1024 * 1024)
+    }
+
+
+def pinned_uploads():
+    # 살아 있는 session 과 끝나지 않은 job 이 쓰는 source 이미지
+    paths = [session.source_path for session in list(SESSIONS.sessions.values())]
+    paths += [entry["spec"]["source_path"] for entry in JOURNAL.unfinished()]
+    return {entry_key(os.path.basename(path)) for path in paths}
+
+
+def pinned_outputs():
+    # 실행 중이거나 아직 메인 서버로 전달되지 않은 job 의 결과 폴더
+    # 전달 대기가 AI_UNDELIVERED_TTL(초) 을 넘으면 더 이상 지키지 않고 outputs TTL/quota 를 따른다
+    job_ids = {job.id for job in list(JOB_QUEUE.jobs.values()) if job.status not in FINISHED_STATES}
+    since = time.time() - float(os.getenv("AI_UNDELIVERED_TTL", "86400"))
+    job_ids |= {job_id for job_id, _ in JOURNAL.undelivered(since)}
+    return job_ids
+
+
+def pinned_templates():
+    # job 템플릿은 .jobs/queued 에 함께 두므로 (다른 profile 의 것까지) 절대 지우지 않는다
+    paths = [profile["template"] for profile in PROFILES.values()] + [BASIC_JOB_PATH]
+    return {entry_key(os.path.basename(path)) for path in paths}
+
+
+def janitor_areas():
+    # result_cache/ 와 face_cache/ 는 각자 크기를 관리하므로 여기서 다루지 않는다
+    areas = [
+        Area("uploads", UPLOAD_FOLDER, pinned=pinned_uploads, **janitor_limits("uploads", 86400, 2048)),
+        Area("outputs", OUTPUT_FOLDER, pinned=pinned_outputs, **janitor_limits("outputs", 3600, 10240)),
+        Area("frames", RUNNER.temp_folder, pinned=RUNNER.temp_in_use, **janitor_limits("frames", 3600))
+    ]
+    # facefusion job 파일은 작지만 개수가 계속 늘어나므로 TTL 만 적용
+    for status in ("drafted", "queued", "completed", "failed"):
+        areas.append(Area(f"jobs_{status}", os.path.join(JOBS_PATH, status), pinned=pinned_templates,
+                          **janitor_limits("jobs", 86400)))
+    return areas
+
+
+def recover_jobs():
+    # 이전 실행에서 끝나지 못한 job 은 같은 job id 로 다시 제출, 전달 못 한 결과는 다시 전달
+    recovered = 0
+    for entry in JOURNAL.unfinished():
+        if not os.path.exists(entry["spec"]["source_path"]):
+            JOURNAL.transition(entry["job_id"], journal.FAILED, "source image missing after restart")
+            continue
+        JOURNAL.transition(entry["job_id"], journal.QUEUED)
+        submit_render(entry["kind"], entry["spec"], entry["session_id"], entry["priority"], job_id=entry["job_id"])
+        recovered += 1
+    redelivered = 0
+    for job_id, output_path in JOURNAL.undelivered():
+        if not os.path.exists(output_path):
+            JOURNAL.transition(job_id, journal.FAILED, f"output missing after restart: {output_path}")
+            continue
+        progress = {"status": "queued", "bytes_sent": 0, "total_bytes": os.path.getsize(output_path)}
+        DELIVERY_QUEUE.submit(upload_output, output_path, progress, job_id, render_job_id=job_id)
+        redelivered += 1
+    if recovered or redelivered:
+        print(f"[+] Recovered {recovered} job(s) and {redelivered} undelivered output(s) from the journal")
+
+
+def submit_render(kind, spec, session_id, priority, job_id=None):
+    # journal 에 남긴 spec 만으로 job 을 만들 수 있어야 재시작 후에도 그대로 다시 제출된다
+    if kind == "batch":
+        job = JOB_QUEUE.submit(process_batch, spec["source_path"], spec["indices"], priority=priority, job_id=job_id,
+                               indices=spec["indices"], session_id=session_id)
+    else:
+        info = {"index": spec["index"], "session_id": session_id, "preview": spec["preview"]}
+        if "preview_job_id" in spec:
+            info["preview_job_id"] = spec["preview_job_id"]
+        job = JOB_QUEUE.submit(process_index, spec["source_path"], spec["index"], spec["preview"],
+                               priority=priority, job_id=job_id, **info)
+    if job_id is None:
+        JOURNAL.add(job.id, kind, spec, session_id, spec.get("index"), priority)
+    return job
+
+
+def journal_status(entry):
+    # journal 상태를 /jobs 응답의 status 값으로 변환
+    if entry["state"] in (journal.RENDERED, journal.DELIVERED, journal.DELIVERY_FAILED):
+        return "completed"
+    return entry["state"]
+
+
+def session_info(gender):
+    # 성별 정보가 필요한 profile 은 요청마다 gender 를 받는다
+    if gender is None:
+        if PROFILE.get("require_gender"):
+            raise HTTPException(status_code=422, detail="gender is required.")
+        return {}
+    return {"gender": gender}
+
+
+def admit(lane, session_id=None):
+    # 앞에서 실행될 job 이 가득 찼거나 한 session 이 너무 많은 job 을 쌓으면 바로 거절
+    # (batch 가 쌓여 있어도 preview/일반 요청은 받는다)
+    priority = PRIORITY_LANES[lane]
+    if MAX_QUEUE_DEPTH and JOB_QUEUE.depth(priority) >= MAX_QUEUE_DEPTH:
+        reject(503, "queue_full", "Server is busy, retry later.", priority)
+    if MAX_SESSION_JOBS and session_id is not None and JOB_QUEUE.pending(session_id=session_id) >= MAX_SESSION_JOBS:
+        reject(429, "session_limit", "Too many jobs queued for this session.", priority)
+    return priority
+
+
+def reject(status_code, reason, detail, priority):
+    retry_after = max(1, math.ceil(JOB_QUEUE.estimate_wait(priority, default=EXPECTED_JOB_SECONDS)))
+    metrics.REJECTED.inc(reason=reason)
+    print(f"[!] Rejected request ({reason}), retry after {retry_after}s")
+    raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+async def resolve_session(file, session_id, **info):
+    if session_id is not None:
+        session = SESSIONS.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found or expired.")
+        return session
+    if file is None:
+        raise HTTPException(status_code=400, detail="File is required for processing.")
+    try:
+        with metrics.timed("upload_save"):
+            source_path = await UPLOAD_STORE.save(file)
+    except UploadError as e:
+        metrics.REJECTED.inc(reason=f"upload_{e.status_code}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    session = SESSIONS.create(source_path, **info)
+    print(f"[+] Session {session.id} created")
+    return session
+
+
+@app.post("/sessions/")
+async def create_session(file: UploadFile = File(...),
+                         gender: Optional[int] = Form(None),
+                         _: None = Depends(verify_api_key)):
+    session = await resolve_session(file, None, **session_info(gender))
+    return session.to_dict()
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str, _: None = Depends(verify_api_key)):
+    if SESSIONS.remove(session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found.")
+    return {"status": "deleted", "session_id": session_id}
+
+
+@app.post("/run_ai/")
+async def run_ai(file: Optional[UploadFile] = File(None),
+                 index: int = Form(...),
+                 session_id: Optional[str] = Form(None),
+                 gender: Optional[int] = Form(None),
+                 preview: Optional[bool] = Form(None),
+                 _: None = Depends(verify_api_key)):
+    if index == -1:
+        print("[=] DONE signal recieved. Going idle")
+        cancelled = []
+        if session_id is not None:
+            # 더 이상 받아 갈 사람이 없으므로 session 의 대기/실행 중 job 을 모두 중단
+            cancelled = [job.id for job in JOB_QUEUE.cancel_all("session done", session_id=session_id)]
+            SESSIONS.remove(session_id)
+        return {"status" : "idle", "cancelled": cancelled}
+
+    if index < 0 or index >= len(TARGET_VIDEO_PATHS):
+        raise HTTPException(status_code=400, detail="Invalid index.")
+
+    if session_id is not None and (existing := JOURNAL.find(session_id, index)) is not None:
+        # 같은 (session, index) 요청이 다시 오면 다시 렌더링하지 않고 기존 job 을 돌려준다
+        print(f"[=] Index {index} of session {session_id} already submitted as job {existing['job_id']}")
+        return {"status": journal_status(existing), "index": index, "job_id": existing["job_id"],
+                "session_id": session_id, "preview": existing["spec"]["preview"], "duplicate": True}
+
+    preview = PREVIEW if preview is None else preview
+    # 업로드 저장 전에 먼저 확인해 포화 상태에서는 빨리 실패
+    priority = admit("preview" if preview else "interactive", session_id)
+    session = await resolve_session(file, session_id, **session_info(gender))
+    print(f"[+] index number is {index}")
+
+    job = submit_render("index", {"source_path": session.source_path, "index": index, "preview": preview},
+                        session.id, priority)
+
+    return {"status": "queued", "index": index, "job_id": job.id, "session_id": session.id, "preview": preview}
+
+
+@app.post("/run_ai/batch/")
+async def run_ai_batch(file: Optional[UploadFile] = File(None),
+                       indices: str = Form("all"),
+                       session_id: Optional[str] = Form(None),
+                       gender: Optional[int] = Form(None),
+                       _: None = Depends(verify_api_key)):
+    # "all" 또는 "0,2,3" 형식
+    if indices == "all":
+        index_list = list(range(len(TARGET_VIDEO_PATHS)))
+    else:
+        try:
+            index_list = list(dict.fromkeys(int(i) for i in indices.split(",")))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid indices.")
+    if not index_list or any(i < 0 or i >= len(TARGET_VIDEO_PATHS) for i in index_list):
+        raise HTTPException(status_code=400, detail="Invalid indices.")
+
+    priority = admit("batch", session_id)
+    session = await resolve_session(file, session_id, **session_info(gender))
+    job = submit_render("batch", {"source_path": session.source_path, "indices": index_list}, session.id, priority)
+
+    return {"status": "queued", "indices": index_list, "job_id": job.id, "session_id": session.id}
+
+
+def output_path_name(index):
+    name = PROFILE.get("output_name", "output_{index}.mp4")
+    return name.format(index=index, target=os.path.basename(TARGET_VIDEO_PATHS[index]))
+
+
+def output_path_for(index, job_id, preview=False):
+    # job 마다 폴더를 따로 써서 동시에 처리되는 요청끼리 결과 파일을 덮어쓰지 않게 한다
+    # (파일 이름은 메인 서버가 받는 그대로 유지)
+    job_folder = os.path.join(OUTPUT_FOLDER, job_id)
+    os.makedirs(job_folder, exist_ok=True)
+    output_path = os.path.join(job_folder, output_path_name(index))
+    if preview:
+        stem, extension = os.path.splitext(output_path)
+        output_path = f"{stem}_preview{extension}"
+    return output_path
+
+
+async def execute_job(job_id, target_paths=(), source_path=None, on_output=None):
+    await RUNNER.run(job_id, target_paths, source_path, on_output)
+
+
+async def render(job, source_path, target_path, output_path, settings):
+    reporter = ProgressReporter(job.info)
+    timings = job.info.setdefault("timings", {})
+    ranges = []
+    if SEGMENT_COUNT > 1:
+        try:
+            total_frames = await asyncio.to_thread(segments.frame_count, target_path)
+            ranges = segments.frame_ranges(total_frames, SEGMENT_COUNT)
+        except (OSError, RuntimeError) as e:
+            print(f"[!] Rendering {target_path} in one piece: {e}")
+
+    if len(ranges) <= 1:
+        with metrics.timed("create_job", timings):
+            job_id, _ = await asyncio.to_thread(
+                create_job_from_basic,
+                source_path=source_path,
+                target_path=target_path,
+                output_path=output_path,
+                settings=settings
+            )
+        with metrics.timed("render", timings):
+            await execute_job(job_id, [target_path], source_path, reporter.callback())
+        with metrics.timed("output_wait", timings):
+            await completion.wait_for_output(output_path, job_id, JOBS_PATH, timeout=OUTPUT_WAIT_TIMEOUT)
+        return
+
+    segment_paths = [segments.segment_path(output_path, number) for number in range(len(ranges))]
+    job_ids = []
+    with metrics.timed("create_job", timings):
+        for (start, end), segment_path in zip(ranges, segment_paths):
+            segment_settings = {**settings, "trim_frame_start": start, "trim_frame_end": end}
+            job_id, _ = await asyncio.to_thread(create_job_from_basic, source_path, target_path, segment_path, segment_settings)
+            job_ids.append(job_id)
+    print(f"[+] Rendering {target_path} as {len(ranges)} segments")
+    try:
+        with metrics.timed("render", timings):
+            results = await asyncio.gather(
+                *(execute_job(job_id, [target_path], source_path, reporter.callback(number))
+                  for number, job_id in enumerate(job_ids)),
+                return_exceptions=True
+            )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        with metrics.timed("output_wait", timings):
+            await asyncio.gather(*(
+                completion.wait_for_output(segment_path, job_id, JOBS_PATH, timeout=OUTPUT_WAIT_TIMEOUT)
+                for segment_path, job_id in zip(segment_paths, job_ids)
+            ))
+        with metrics.timed("concat", timings):
+            await asyncio.to_thread(segments.concat, segment_paths, target_path, output_path)
+    finally:
+        for segment_path in segment_paths:
+            if os.path.exists(segment_path):
+                os.remove(segment_path)
+
+
+async def process_index(job, source_path, index, preview=False):
+    JOURNAL.transition(job.id, journal.RUNNING)
+    target_path = TARGET_VIDEO_PATHS[index]
+    if preview:
+        full_key = await asyncio.to_thread(result_key, source_path, target_path, job_template(), JOB_SETTINGS)
+        if full_key in RESULT_CACHE:
+            # 원본 화질 결과가 이미 있으면 preview 없이 바로 전달
+            preview = False
+            job.info["preview"] = False
+    settings = {**JOB_SETTINGS, **PREVIEW_SETTINGS} if preview else JOB_SETTINGS
+    output_path = output_path_for(index, job.id, preview)
+
+    cache_key = await asyncio.to_thread(result_key, source_path, target_path, job_template(), settings)
+    cached = await asyncio.to_thread(RESULT_CACHE.fetch, cache_key, output_path)
+    if cached:
+        print(f"[=] Result cache hit for index {index}")
+    else:
+        # 같은 렌더가 진행 중이면 기다렸다가 결과를 공유
+        # 앞선 렌더가 취소·실패해 결과가 없으면 직접 렌더링한다
+        while (inflight := RENDERS.join(cache_key)) is not None:
+            print(f"[=] Index {index} attached to an in-flight render")
+            await inflight.wait()
+        RENDERS.claim(cache_key)
+        try:
+            # fetch 이후 앞선 렌더가 끝났을 수 있으므로 다시 확인 (hit/miss 는 처음 fetch 에서만 센다)
+            cached = await asyncio.to_thread(RESULT_CACHE.fetch, cache_key, output_path, False)
+            if not cached:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                await render(job, source_path, target_path, output_path, settings)
+                await asyncio.to_thread(RESULT_CACHE.put, cache_key, output_path)
+        finally:
+            RENDERS.release(cache_key)
+    await deliver_output(job, output_path)
+
+    result = {"output_path": output_path, "cached": cached}
+    if preview:
+        # 이미 받은 요청의 후속 작업이므로 admission 확인 없이 일반 lane 에 넣는다
+        follow_up = submit_render("follow_up", {"source_path": source_path, "index": index, "preview": False,
+                                                "preview_job_id": job.id},
+                                  job.info.get("session_id"), PRIORITY_LANES["interactive"])
+        print(f"[+] Full render for index {index} queued as job {follow_up.id}")
+        job.info["follow_up_job_id"] = follow_up.id
+        result["preview"] = True
+    return result
+
+
+async def process_batch(job, source_path, indices):
+    JOURNAL.transition(job.id, journal.RUNNING)
+    targets = {index: (TARGET_VIDEO_PATHS[index], output_path_for(index, job.id)) for index in indices}
+    cache_keys = {}
+    cached = set()
+    for index, (target_path, output_path) in targets.items():
+        cache_keys[index] = await asyncio.to_thread(result_key, source_path, target_path, job_template(), JOB_SETTINGS)
+        if await asyncio.to_thread(RESULT_CACHE.fetch, cache_keys[index], output_path):
+            cached.add(index)
+        elif os.path.exists(output_path):
+            os.remove(output_path)
+
+    # 캐시에 없는 결과만, 같은 결과(중복 target)는 한 번만 렌더링
+    # 다른 요청이 이미 렌더링 중인 결과는 기다렸다가 공유
+    # 앞선 렌더가 취소·실패해 결과가 없으면 그 결과는 다음 차례에 직접 렌더링
+    pending = {}
+    for index in indices:
+        if index not in cached:
+            pending.setdefault(cache_keys[index], targets[index])
+    rendered = {}
+    while pending:
+        waiting = {}
+        claimed = {}
+        for key, target in pending.items():
+            inflight = RENDERS.join(key)
+            if inflight is not None:
+                waiting[key] = inflight
+            else:
+                claimed[key] = target
+        if claimed:
+            await render_batch(job, source_path, claimed)
+            rendered.update(claimed)
+        for inflight in waiting.values():
+            await inflight.wait()
+        pending = {key: pending[key] for key in waiting if key not in RESULT_CACHE}
+
+    results = {}
+    job.info["results"] = results
+    for index in indices:
+        output_path = targets[index][1]
+        if index not in cached and rendered.get(cache_keys[index]) != targets[index]:
+            await asyncio.to_thread(RESULT_CACHE.fetch, cache_keys[index], output_path, False)
+        if os.path.exists(output_path):
+            await deliver_output(job, output_path)
+            results[index] = {"status": "completed", "output_path": output_path, "cached": index in cached}
+        else:
+            results[index] = {"status": "failed"}
+
+    if not any(result["status"] == "completed" for result in results.values()):
+        raise RuntimeError("batch job produced no outputs")
+    return {"results": results}
+
+
+async def render_batch(job, source_path, claimed):
+    # claimed: cache key → (target_path, output_path), 모두 이 job 이 렌더링한다
+    for key in claimed:
+        RENDERS.claim(key)
+    try:
+        timings = job.info.setdefault("timings", {})
+        with metrics.timed("create_job", timings):
+            job_id = await asyncio.to_thread(create_batch_job_from_basic, source_path, list(claimed.values()))
+        try:
+            with metrics.timed("render", timings):
+                await execute_job(job_id, [target_path for target_path, _ in claimed.values()], source_path,
+                                  ProgressReporter(job.info).callback())
+            with metrics.timed("output_wait", timings):
+                await asyncio.gather(*(
+                    completion.wait_for_output(output_path, job_id, JOBS_PATH, timeout=OUTPUT_WAIT_TIMEOUT)
+                    for _, output_path in claimed.values()
+                ))
+        except (RuntimeError, TimeoutError) as e:
+            # 실패한 job 의 결과물은 완전하다는 보장이 없으므로 캐시하거나 전달하지 않는다
+            print(f"❌ Batch job {job_id} failed: {e}")
+            for _, output_path in claimed.values():
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+            return
+        for key, (_, output_path) in claimed.items():
+            await asyncio.to_thread(RESULT_CACHE.put, key, output_path)
+    finally:
+        for key in claimed:
+            RENDERS.release(key)
+
+
+async def deliver_output(job, output_path):
+    progress = {"status": "queued", "bytes_sent": 0, "total_bytes": os.path.getsize(output_path)}
+    job.info.setdefault("delivery", {})[os.path.basename(output_path)] = progress
+    JOURNAL.add_output(job.id, output_path)
+    if PIPELINED_DELIVERY:
+        DELIVERY_QUEUE.submit(upload_output, output_path, progress, job.id, render_job_id=job.id)
+    else:
+        await upload_output(None, output_path, progress, job.id)
+
+
+async def upload_output(delivery_job, output_path, progress, render_job_id):
+    def update(bytes_sent, total_bytes):
+        progress["bytes_sent"] = bytes_sent
+        progress["total_bytes"] = total_bytes
+
+    progress["status"] = "uploading"
+    try:
+        with metrics.timed("delivery", delivery_job.info.setdefault("timings", {}) if delivery_job else None):
+            await send_output_to_main_server(output_path, update)
+    except Exception as e:
+        # 재시도까지 모두 실패한 경우: 재시작 때 다시 보내지 않도록 journal 에 남긴다
+        progress["status"] = "failed"
+        JOURNAL.delivery_failed(render_job_id, output_path, str(e) or e.__class__.__name__)
+        raise
+    progress["status"] = "delivered"
+    metrics.UPLOADED_BYTES.inc(progress["total_bytes"])
+    JOURNAL.delivered(render_job_id, output_path)
+
+
+metrics.REGISTRY.register(metrics.Gauge("ai_queue_depth", "Render jobs waiting in the queue.", func=lambda: JOB_QUEUE.depth()))
+metrics.REGISTRY.register(metrics.Gauge("ai_jobs_in_flight", "Render jobs currently running.", func=lambda: JOB_QUEUE.running()))
+metrics.REGISTRY.register(metrics.Gauge("ai_delivery_queue_depth", "Uploads waiting in the delivery queue.", func=lambda: DELIVERY_QUEUE.depth()))
+metrics.REGISTRY.register(metrics.Counter("ai_result_cache_hits_total", "Result cache hits.", func=lambda: RESULT_CACHE.hits))
+metrics.REGISTRY.register(metrics.Counter("ai_result_cache_misses_total", "Result cache misses.", func=lambda: RESULT_CACHE.misses))
+metrics.REGISTRY.register(metrics.Gauge("ai_result_cache_bytes", "Bytes held by the result cache.", func=lambda: RESULT_CACHE.total_bytes))
+metrics.REGISTRY.register(metrics.Counter("ai_renders_coalesced_total", "Requests that joined an identical in-flight render.", func=lambda: RENDERS.coalesced))
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.api_route("/results/{job_id}", methods=["GET", "HEAD"])
+async def get_result(job_id: str, request: Request, index: Optional[int] = None,
+                     _: None = Depends(verify_api_key)):
+    # push 전달과 별개로 메인 서버(또는 앞단 CDN)가 결과를 직접 받아 갈 수 있게 한다 (Range/ETag 지원)
+    entry = JOURNAL.get(job_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    output_paths = list(entry["outputs"])
+    if index is not None:
+        if index < 0 or index >= len(TARGET_VIDEO_PATHS):
+            raise HTTPException(status_code=400, detail="Invalid index.")
+        output_paths = [path for path in output_paths if os.path.basename(path) == output_path_name(index)]
+    if not output_paths:
+        raise HTTPException(status_code=409, detail=f"No result yet (job is {journal_status(entry)}).")
+    if len(output_paths) > 1:
+        raise HTTPException(status_code=400, detail="index is required for batch jobs.")
+
+    output_path = output_paths[0]
+    try:
+        stat_result = await asyncio.to_thread(os.stat, output_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="Result has been removed.")
+    etag = etag_for(job_id, stat_result)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return ResultFileResponse(output_path, media_type="video/mp4", filename=os.path.basename(output_path),
+                              stat_result=stat_result, headers={"ETag": etag, "Cache-Control": "private, max-age=3600"})
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, _: None = Depends(verify_api_key)):
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        # 메모리 기록에서 밀려났거나 재시작 전의 job 은 journal 에서 조회
+        entry = JOURNAL.get(job_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        return {**entry, "status": journal_status(entry)}
+    return job.to_dict()
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, _: None = Depends(verify_api_key)):
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job.status in FINISHED_STATES:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}.")
+    JOB_QUEUE.cancel(job_id)
+    # 실행 중이면 프로세스가 정리될 때까지 잠시 기다렸다가 최종 상태를 돌려준다
+    try:
+        await asyncio.wait_for(job.done.wait(), timeout=10)
+    except asyncio.TimeoutError:
+        pass
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, _: None = Depends(verify_api_key)):
+    # Server-Sent Events: 진행률이 바뀔 때마다 전송, 끝나면 done 이벤트로 최종 상태 전송
+    job = JOB_QUEUE.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def events():
+        last = None
+        while job.status not in FINISHED_STATES:
+            state = {"status": job.status, "progress": job.info.get("progress")}
+            if state != last:
+                yield f"data: {json.dumps(state)}\n\n"
+                last = state
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+        yield f"event: done\ndata: {json.dumps(job.to_dict())}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
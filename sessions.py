@@ -0,0 +1,68 @@
+import os
+import time
+import uuid
+
+
+class Session:
+    def __init__(self, source_path, session_id=None, created_at=None, **info):
+        self.id = session_id or uuid.uuid4().hex
+        self.source_path = source_path
+        self.info = info
+        self.created_at = created_at or time.time()
+        self.last_used = time.time()
+
+    def to_dict(self):
+        return {
+            "session_id": self.id,
+            "source_path": self.source_path,
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+            **self.info,
+        }
+
+
+class SessionStore:
+    """Per-user source image state, expired after ``ttl`` seconds of inactivity.
+
+    With a ``journal`` the sessions survive a restart; restored sessions
+    start a fresh TTL.
+    """
+
+    def __init__(self, ttl=1800, journal=None):
+        self.ttl = ttl
+        self.journal = journal
+        self.sessions = {}
+        if journal is not None:
+            for session_id, source_path, info, created_at in journal.sessions():
+                if os.path.exists(source_path):
+                    self.sessions[session_id] = Session(source_path, session_id, created_at, **info)
+                else:
+                    journal.remove_session(session_id)
+
+    def create(self, source_path, **info):
+        self.purge()
+        session = Session(source_path, **info)
+        self.sessions[session.id] = session
+        if self.journal is not None:
+            self.journal.save_session(session)
+        return session
+
+    def get(self, session_id):
+        self.purge()
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.time()
+        return session
+
+    def remove(self, session_id):
+        if self.journal is not None:
+            self.journal.remove_session(session_id)
+        return self.sessions.pop(session_id, None)
+
+    def purge(self):
+        now = time.time()
+        expired = [s for s in self.sessions.values() if now - s.last_used > self.ttl]
+        for session in expired:
+            self.remove(session.id)
+            print(f"[-] Session {session.id} expired")
+        return expired
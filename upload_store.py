@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+
+from PIL import Image, ImageOps
+
+import face_cache
+
+CHUNK_SIZE = 1024 * 1024
+
+# 파일 앞부분(magic bytes)으로 판별하는 허용 이미지 형식
+SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"BM", ".bmp"),
+)
+
+
+class UploadError(ValueError):
+    """Rejected upload; ``status_code`` is the HTTP status to answer with."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def image_extension(head):
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    raise UploadError(415, "Unsupported image type (expected JPEG, PNG, WebP or BMP).")
+
+
+def downscale(path, max_side):
+    """Shrink the image at path in place so neither side exceeds max_side.
+
+    EXIF orientation is applied first because the rewritten file drops the
+    tag. Returns True if the image was rewritten.
+    """
+    try:
+        with Image.open(path) as image:
+            if max(image.size) <= max_side:
+                return False
+            image_format = image.format
+            original_size = image.size
+            image = ImageOps.exif_transpose(image)
+    except Image.DecompressionBombError:
+        raise UploadError(413, "Image has too many pixels.")
+    except OSError:
+        raise UploadError(415, "File is not a readable image.")
+
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    options = {}
+    if image_format == "JPEG":
+        options["quality"] = 95
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+    image.save(path, format=image_format, **options)
+    print(f"[=] Source image downscaled from {original_size[0]}x{original_size[1]} to {image.size[0]}x{image.size[1]}")
+    return True
+
+
+class UploadStore:
+    """Source images stored under the sha256 of their content.
+
+    The same photo uploaded twice maps to one file, and two different photos
+    sharing a filename no longer overwrite each other. The source face
+    analysis for an image is cached next to it as ``<hash>.faces.npz``.
+
+    Uploads are read in chunks and hashed as they arrive. Anything over
+    ``max_bytes`` or not a known image type is rejected with UploadError.
+    Images larger than ``max_side`` are downscaled before they are stored;
+    the hash is taken from the uploaded bytes, so a repeated upload is
+    still found without decoding it again.
+    """
+
+    def __init__(self, folder, max_bytes=0, max_side=0):
+        self.folder = os.path.abspath(folder)
+        self.max_bytes = max_bytes
+        self.max_side = max_side
+        os.makedirs(self.folder, exist_ok=True)
+        # 결과 캐시 키를 만들 때 업로드 이미지를 다시 읽어 hash 하지 않도록
+        face_cache.CONTENT_ADDRESSED_FOLDERS.add(self.folder)
+
+    async def save(self, file):
+        temp_path = os.path.join(self.folder, f".upload-{uuid.uuid4().hex}")
+        digest = hashlib.sha256()
+        extension = None
+        size = 0
+        try:
+            with open(temp_path, "wb") as buffer:
+                while chunk := await file.read(CHUNK_SIZE):
+                    if extension is None:
+                        extension = image_extension(chunk)
+                    size += len(chunk)
+                    if self.max_bytes and size > self.max_bytes:
+                        raise UploadError(413, f"Upload is larger than {self.max_bytes // (1024 * 1024)} MB.")
+                    digest.update(chunk)
+                    await asyncio.to_thread(buffer.write, chunk)
+            if extension is None:
+                raise UploadError(400, "File is empty.")
+            save_path = os.path.join(self.folder, f"{digest.hexdigest()}{extension}")
+            if os.path.exists(save_path):
+                print(f"[=] Source image already stored at {save_path}")
+            else:
+                if self.max_side:
+                    await asyncio.to_thread(downscale, temp_path, self.max_side)
+                os.replace(temp_path, save_path)
+                print(f"[+] Source image saved at {save_path}")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return save_path
+
+
+class ContentLengthLimit:
+    """ASGI middleware that answers 413 before an oversized body is read.
+
+    Multipart bodies are parsed before the endpoint runs, so the upload
+    limit has to be checked on Content-Length first. ``slack`` covers the
+    multipart framing and form fields around the file.
+    """
+
+    def __init__(self, app, max_bytes=0, slack=64 * 1024):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.slack = slack
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.max_bytes:
+            content_length = dict(scope["headers"]).get(b"content-length", b"")
+            if content_length.isdigit() and int(content_length) > self.max_bytes + self.slack:
+                body = json.dumps({"detail": "Upload is too large."}).encode()
+                await send({"type": "http.response.start", "status": 413, "headers": [
+                    (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())
+                ]})
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import os
+import random
+import uuid
+
+import aiofiles
+import httpx
+
+CHUNK_SIZE = 1024 * 1024
+RETRY_STATUS_CODES = (408, 425, 429, 500, 502, 503, 504)
+
+
+class UploadError(Exception):
+    pass
+
+
+class ResultUploader:
+    """Long-lived uploader for rendered results.
+
+    One pooled ``httpx.AsyncClient`` is shared by every upload. Files are
+    streamed from disk in chunks, and transient failures (connection errors,
+    timeouts, 5xx/429) are retried with exponential backoff.
+
+    If ``chunked_url`` is set, files go through a resumable protocol instead
+    of a single multipart POST. Each chunk is a ``PUT {chunked_url}/{upload_id}``
+    with a ``Content-Range`` header. The receiver answers 308 with a
+    ``Range: bytes=0-N`` header while incomplete and 200/201 when done. After
+    a failure, ``Content-Range: bytes */total`` asks the receiver how much it
+    already has, so only the missing tail is re-sent.
+    """
+
+    def __init__(self, url, chunked_url=None, timeout=200.0, retries=5, backoff=1.0, chunk_size=CHUNK_SIZE):
+        self.url = url
+        self.chunked_url = chunked_url.rstrip("/") if chunked_url else None
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+        self.client = None
+
+    def _client(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(max_connections=8, max_keepalive_connections=4)
+            )
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _headers(self):
+        return {"X-API-KEY": os.getenv("API_KEY", "")}
+
+    async def send(self, file_path, progress=None):
+        """Upload file_path; progress(bytes_sent, total_bytes) is called as data goes out."""
+        if self.chunked_url:
+            return await self._send_resumable(file_path, progress)
+        return await self._retry(lambda: self._post_multipart(file_path, progress), file_path)
+
+    async def _retry(self, attempt, file_path):
+        for number in range(self.retries + 1):
+            try:
+                response = await attempt()
+            except httpx.TransportError as e:
+                error = f"{e.__class__.__name__}: {e}"
+            else:
+                if response.status_code < 400:
+                    return response
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise UploadError(f"upload of {file_path} rejected with {response.status_code}")
+                error = f"HTTP {response.status_code}"
+            if number == self.retries:
+                raise UploadError(f"upload of {file_path} failed after {number + 1} attempts ({error})")
+            delay = self.backoff * (2 ** number) * (0.5 + random.random())
+            print(f"[!] Upload of {os.path.basename(file_path)} failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _post_multipart(self, file_path, progress=None):
+        boundary = uuid.uuid4().hex
+        filename = os.path.basename(file_path)
+        head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f"Content-Type: video/mp4\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        size = os.path.getsize(file_path)
+
+        async def body():
+            bytes_sent = 0
+            yield head
+            async with aiofiles.open(file_path, "rb") as f:
+                while chunk := await f.read(self.chunk_size):
+                    yield chunk
+                    bytes_sent += len(chunk)
+                    if progress is not None:
+                        progress(bytes_sent, size)
+            yield tail
+
+        headers = {
+            **self._headers(),
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            "Content-Length": str(len(head) + size + len(tail))
+        }
+        return await self._client().post(self.url, content=body(), headers=headers)
+
+    def upload_id(self, file_path):
+        stat = os.stat(file_path)
+        key = f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    async def _send_resumable(self, file_path, progress=None):
+        url = f"{self.chunked_url}/{self.upload_id(file_path)}"
+        size = os.path.getsize(file_path)
+        headers = {**self._headers(), "X-File-Name": os.path.basename(file_path)}
+        offset = 0
+        resumes = 0
+
+        async with aiofiles.open(file_path, "rb") as f:
+            while True:
+                await f.seek(offset)
+                chunk = await f.read(self.chunk_size)
+                if chunk:
+                    content_range = f"bytes {offset}-{offset + len(chunk) - 1}/{size}"
+                else:
+                    content_range = f"bytes */{size}"
+
+                try:
+                    response = await self._retry(
+                        lambda: self._client().put(url, content=chunk, headers={**headers, "Content-Range": content_range}),
+                        file_path
+                    )
+                except UploadError:
+                    if resumes == self.retries:
+                        raise
+                    resumes += 1
+                    # 중간에 끊긴 경우 서버가 받은 위치를 확인한 뒤 그 뒤부터 다시 전송
+                    response = await self._retry(
+                        lambda: self._client().put(url, headers={**headers, "Content-Range": f"bytes */{size}"}),
+                        file_path
+                    )
+                    if response.status_code != 308:
+                        return response
+                    offset = self._received(response, 0)
+                    print(f"[!] Resuming upload of {os.path.basename(file_path)} at byte {offset}")
+                    continue
+
+                if response.status_code != 308:
+                    if progress is not None:
+                        progress(size, size)
+                    return response
+                offset = self._received(response, offset + len(chunk))
+                if progress is not None:
+                    progress(offset, size)
+
+    @staticmethod
+    def _received(response, default):
+        received = response.headers.get("Range")
+        if not received:
+            return default
+        return int(received.rsplit("-", 1)[1]) + 1